@@ -1,17 +1,54 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
 
-from .models import Group, Post
+from . import purge, search
+from .models import Group, Post, User
+
+
+class FullTextSearchMixin:
+    """Поиск в админке по индексу FTS5 вместо LIKE '%…%'."""
+
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        queryset = search.filter_queryset(
+            queryset, self.search_kind, search_term
+        )
+        return queryset, False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author')
     search_fields = ('text',)
+    search_kind = 'post'
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'slug', 'title')
     search_fields = ('title',)
+    search_kind = 'group'
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AccountAdmin(UserAdmin):
+    actions = ('remove_accounts',)
+
+    def remove_accounts(self, request, queryset):
+        for user in queryset:
+            purge.remove_user(user)
+        self.message_user(
+            request, 'Аккаунты скрыты и будут удалены purge_deleted.'
+        )
+
+    remove_accounts.short_description = 'Скрыть и удалить в фоне'
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import search, signals, sqlite  # noqa: F401
+
+        connection_created.connect(sqlite.configure)
+        post_migrate.connect(search.install, sender=self)
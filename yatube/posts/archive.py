@@ -0,0 +1,50 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache_versions
+from .models import ArchivedPost, Post, Timeline
+
+FIELDS = [field.attname for field in ArchivedPost._meta.concrete_fields]
+
+
+def archive(older_than, batch_size, pause=0):
+    """
+    Переносит записи старше ``older_than`` в ArchivedPost пачками, каждую
+    в своей транзакции. id сохраняются, поэтому ссылки, комментарии и
+    поисковый индекс продолжают работать.
+    """
+    cutoff = timezone.now() - older_than
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Post.objects.filter(pub_date__lt=cutoff)
+                .order_by('pub_date')
+                .values(*FIELDS)[:batch_size]
+            )
+            if not rows:
+                return total
+            ArchivedPost.objects.bulk_create(
+                ArchivedPost(**row) for row in rows
+            )
+            ids = [row['id'] for row in rows]
+            # Лента подписок хранит только свежие записи; сигналы
+            # удаления не нужны: запись не исчезла, а переехала.
+            # Комментарии остаются: их post_id теперь указывает на
+            # ArchivedPost, а сирот без записи удаляет purge().
+            for queryset in (
+                Timeline.objects.filter(post_id__in=ids),
+                Post.all_objects.filter(pk__in=ids),
+            ):
+                queryset._raw_delete(queryset.db)
+        # Архивная карточка без кнопок автора: фрагменты нужно обновить.
+        cache_versions.bump(
+            'index',
+            *{f"author:{row['author_id']}" for row in rows},
+            *{f"group:{row['group_id']}" for row in rows if row['group_id']},
+        )
+        total += len(rows)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,48 @@
+from django.core.cache.backends import locmem
+from django.template.backends import django
+
+from . import metrics, sqlitecache, timing
+
+MISSING = object()
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        # Время вложенных {% include %} входит сюда же: их рендерит
+        # движок, минуя бэкенд. Запросы и миниатюры из шаблона measure
+        # вычитает и относит к своим этапам.
+        with timing.measure('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """Шаблоны Django, время рендеринга которых попадает в Server-Timing."""
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+
+class InstrumentedCacheMixin:
+    """
+    Считает попадания и промахи кэша, в том числе фрагментов шаблонов.
+    get_many базового класса читает ключи через get и учитывается там же.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        result = 'miss' if value is MISSING else 'hit'
+        timing.count(f'cache_{result}')
+        if str(key).startswith(metrics.FRAGMENT_PREFIX):
+            metrics.inc('yatube_fragment_cache_total', result=result)
+        return default if value is MISSING else value
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class SQLiteCache(InstrumentedCacheMixin, sqlitecache.SQLiteCache):
+    pass
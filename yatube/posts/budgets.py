@@ -0,0 +1,65 @@
+import logging
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Управление транзакциями не считается: в тестах каждый atomic — это
+# SAVEPOINT и RELEASE, а в работе — один BEGIN.
+TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')
+
+
+class QueryCounter:
+    """
+    Обёртка execute_wrapper: считает запросы по тексту SQL с плейсхолдерами,
+    поэтому N+1 видно как один и тот же запрос, повторённый N раз.
+    """
+
+    def __init__(self):
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(TRANSACTION_CONTROL):
+            self.statements[sql] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+
+@contextmanager
+def counting():
+    """Считает запросы ко всем базам; работает и при DEBUG = False."""
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield counter
+
+
+def limit(view_name):
+    return settings.QUERY_BUDGETS.get(view_name)
+
+
+def describe(view_name, counter):
+    lines = [
+        f'{view_name}: {counter.count} запросов при бюджете '
+        f'{limit(view_name)}'
+    ]
+    # Самые частые запросы первыми: при N+1 это и есть виновник.
+    for sql, times in counter.statements.most_common(3):
+        lines.append(f'  {times} раз: {sql}')
+    return '\n'.join(lines)
+
+
+def check(view_name, counter):
+    """Пишет предупреждение, если view превысило свой бюджет."""
+    budget = limit(view_name)
+    if budget is not None and counter.count > budget:
+        logger.warning(describe(view_name, counter))
+        return False
+    return True
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY = 'feed:version:{}'
+BUMPED = 'feed:bumped:{}'
+
+
+def _initial():
+    # Счётчик, вытесненный из кэша, не должен начинаться заново с
+    # номера, под которым ещё могут лежать старые фрагменты.
+    return time.time_ns()
+
+
+def version(*scopes):
+    """Общая версия лент ``scopes`` для ключа фрагментного кэша."""
+    keys = [KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial(), None)
+        versions.update(cache.get_many(missing))
+    return '.'.join(str(versions.get(key, 0)) for key in keys)
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), None)
+    if settings.DATABASE_REPLICAS:
+        # Метка живёт, пока реплики могут не знать об изменении.
+        cache.set_many(
+            {BUMPED.format(scope): True for scope in scopes},
+            settings.REPLICA_MAX_LAG,
+        )
+
+
+def settled(*scopes):
+    """Прошло ли с последнего сброса версий больше REPLICA_MAX_LAG."""
+    return not cache.get_many([BUMPED.format(scope) for scope in scopes])
+
+
+def bump_post(post, *group_ids):
+    group_ids = {post.group_id, *group_ids} - {None}
+    bump(
+        'index',
+        f'author:{post.author_id}',
+        *(f'group:{group_id}' for group_id in group_ids),
+    )
@@ -0,0 +1,52 @@
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ArchivedPost, Comment, Post
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'image', 'group__slug')
+COMMENT_FIELDS = ('id', 'post_id', 'text', 'created')
+
+
+def records(author):
+    """
+    Записи и комментарии автора словарями. Строки читаются из курсора
+    порциями по EXPORT_CHUNK_SIZE, поэтому память не растёт с их числом.
+    Записи выгружаются в формате, который понимает import_posts: сначала
+    архивные, потом свежие.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    for model in (ArchivedPost, Post):
+        posts = (
+            model.objects.filter(author=author)
+            .order_by('pub_date')
+            .values(*POST_FIELDS)
+        )
+        for post in posts.iterator(chunk_size=chunk_size):
+            post['group'] = post.pop('group__slug')
+            yield {'type': 'post', 'author': author.username, **post}
+    comments = (
+        Comment.objects.filter(author=author)
+        .order_by('pk')
+        .values(*COMMENT_FIELDS)
+    )
+    for comment in comments.iterator(chunk_size=chunk_size):
+        yield {'type': 'comment', **comment}
+
+
+def ndjson(rows):
+    for row in rows:
+        line = json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield line + '\n'
+
+
+def gzipped(chunks):
+    """Сжимает поток по мере чтения, не собирая его целиком."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
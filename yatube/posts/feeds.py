@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import quote_etag
+from django.utils.text import Truncator
+
+from . import cache_versions
+from .models import Group, Post, User
+
+FEED_TYPES = {'rss': Rss201rev2Feed, 'atom': Atom1Feed}
+KEY = 'feed:{}:{}:{}'
+
+
+class PostsFeed(Feed):
+    def __init__(self, feed_type):
+        super().__init__()
+        self.feed_type = feed_type
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        posts = self.posts(obj).select_related('author', 'group')
+        return posts[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post', args=[item.author.username, item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Последние записи на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, group):
+        return group.posts.all()
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('group', args=[group.slug])
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def posts(self, author):
+        return author.posts.all()
+
+    def title(self, author):
+        return f'Yatube: записи {author.username}'
+
+    def description(self, author):
+        return f'Записи автора {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+
+def serve(request, feed_class, feed_format, scope, **kwargs):
+    """
+    Отдаёт ленту ``scope`` из кэша. Валидатор — только ETag из версии
+    ленты: дата последней записи не меняется при правке и уходит назад
+    при удалении, поэтому Last-Modified не отдаётся. Повторный опрос
+    получает 304 без запросов к базе.
+    """
+    if feed_format not in FEED_TYPES:
+        raise Http404
+    version = cache_versions.version(scope)
+    etag = quote_etag(f'{feed_format}-{version}')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = KEY.format(feed_format, scope, version)
+        response = cache.get(key)
+        if response is None:
+            feed = feed_class(FEED_TYPES[feed_format])
+            response = feed(request, **kwargs)
+            # Feed ставит дату самой новой записи, см. выше.
+            del response['Last-Modified']
+            cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,345 @@
+import math
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.db import connections, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import stats, timeline
+from .models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    Timeline,
+    User,
+    explicit_pub_date,
+)
+
+BATCH_SIZE = 1000
+SAMPLE_SIZE = 5000
+VOLUMES = {
+    'users': 1000,
+    'groups': 50,
+    'posts': 50000,
+    'comments': 100000,
+    'follows': 20000,
+}
+WORDS = (
+    'котики собаки погода город работа отпуск книга кино музыка море '
+    'горы поезд ужин завтрак друзья семья футбол выставка концерт лес '
+    'весна осень зима лето дача сад рецепт фото прогулка новости'
+).split()
+
+
+def zipf_weights(count, alpha=1.1):
+    """
+    Накопленные веса закона Ципфа для ``random.choices``: объекты в
+    начале списка выбираются гораздо чаще хвоста, как популярные авторы
+    и свежие записи.
+    """
+    return list(accumulate(1 / rank**alpha for rank in range(1, count + 1)))
+
+
+def text(rng, low=5, high=60):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def _bulk(model, objects):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, BATCH_SIZE))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+
+def _follows(users, count, rng):
+    weights = zipf_weights(len(users))
+    count = min(count, len(users) * (len(users) - 1))
+    edges = set()
+    for _ in range(count * 10):
+        if len(edges) >= count:
+            break
+        (author,) = rng.choices(users, cum_weights=weights)
+        user = rng.choice(users)
+        if user != author:
+            edges.add((user, author))
+    return (Follow(user_id=user, author_id=author) for user, author in edges)
+
+
+def _posts(users, groups, count, rng, days):
+    weights = zipf_weights(len(users))
+    now = timezone.now()
+    for _ in range(count):
+        (author,) = rng.choices(users, cum_weights=weights)
+        group = rng.choice(groups) if groups and rng.random() < 0.7 else None
+        age = timedelta(seconds=rng.uniform(0, days * 86400))
+        yield Post(
+            text=text(rng),
+            author_id=author,
+            group_id=group,
+            pub_date=now - age,
+        )
+
+
+def _comments(users, count, rng):
+    posts = list(
+        Post.objects.order_by('-pub_date').values_list('pk', flat=True)
+    )
+    if not posts:
+        return
+    weights = zipf_weights(len(posts))
+    for _ in range(count):
+        (post,) = rng.choices(posts, cum_weights=weights)
+        yield Comment(
+            post_id=post, author_id=rng.choice(users), text=text(rng, 2, 20)
+        )
+
+
+def _fan_out():
+    posts = Post.objects.order_by().values_list('pk', 'author_id', 'pub_date')
+    posts = posts.iterator(chunk_size=BATCH_SIZE)
+    while True:
+        batch = list(islice(posts, BATCH_SIZE))
+        if not batch:
+            return
+        timeline.fan_out_many(batch)
+
+
+def seed(volumes, rng, days=730):
+    """
+    Наполняет базу пользователями, группами, подписками, записями и
+    комментариями через bulk_create. Популярность авторов и записей
+    подчиняется закону Ципфа; даты записей разбросаны на ``days`` дней
+    назад, так что часть из них годится для archive_posts.
+    """
+    with transaction.atomic():
+        _bulk(
+            User,
+            (
+                User(username=f'user{number}', password='!')
+                for number in range(volumes['users'])
+            ),
+        )
+        _bulk(
+            Group,
+            (
+                Group(title=f'Группа {number}', slug=f'group-{number}')
+                for number in range(volumes['groups'])
+            ),
+        )
+        users = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        groups = list(Group.objects.values_list('pk', flat=True))
+        _bulk(Follow, _follows(users, volumes['follows'], rng))
+        # Ленты подписок не раскладываются для «тяжёлых» авторов, а их
+        # определяют по счётчикам подписчиков.
+        stats.rebuild()
+        with explicit_pub_date():
+            _bulk(Post, _posts(users, groups, volumes['posts'], rng, days))
+        _fan_out()
+        _bulk(Comment, _comments(users, volumes['comments'], rng))
+        counted = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        Post.objects.update(
+            comments_count=Coalesce(
+                Subquery(counted, output_field=IntegerField()), 0
+            )
+        )
+        stats.rebuild()
+
+
+def counts():
+    return {
+        model._meta.model_name: model._base_manager.count()
+        for model in (User, Group, Follow, Post, Comment, Timeline)
+    }
+
+
+class Dataset:
+    """Выборка имён, групп и записей, из которых строятся адреса."""
+
+    def __init__(self):
+        users = User.objects.filter(is_active=True)
+        self.users = list(users.values_list('username', 'pk')[:SAMPLE_SIZE])
+        self.groups = list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+        )
+        self.posts = list(
+            Post.objects.order_by('-pub_date').values_list(
+                'author__username', 'pk'
+            )[:SAMPLE_SIZE]
+        )
+
+
+class Session:
+    """Клиент одного потока, вошедший под случайным пользователем."""
+
+    def __init__(self, dataset, rng):
+        self.dataset = dataset
+        self.rng = rng
+        self.username, self.user_id = rng.choice(dataset.users)
+        self.client = Client()
+        self.client.force_login(User.objects.get(pk=self.user_id))
+
+    def author(self):
+        return self.rng.choice(self.dataset.users)[0]
+
+    def group(self):
+        return self.rng.choice(self.dataset.groups)
+
+    def post(self):
+        return self.rng.choice(self.dataset.posts)
+
+    def own_post(self):
+        post = Post.objects.filter(author_id=self.user_id).first()
+        if post is None:
+            post = self.new_post()
+        return post.pk
+
+    def new_post(self):
+        return Post.objects.create(author_id=self.user_id, text=text(self.rng))
+
+    def request(self, name):
+        method, args, params = SCENARIOS[name]
+        # Адрес и данные готовятся до замера: own_post() и new_post()
+        # сами ходят в базу.
+        url = reverse(name, args=args(self))
+        data = params(self)
+        with ExitStack() as stack:
+            queries = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            started = time.perf_counter()
+            try:
+                response = getattr(self.client, method)(url, data)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                status = response.status_code
+            except Exception:
+                status = 500
+            elapsed = time.perf_counter() - started
+        return name, elapsed, sum(len(query) for query in queries), status
+
+
+def _none(session):
+    return []
+
+
+def _empty(session):
+    return {}
+
+
+def _text(session):
+    return {'text': text(session.rng)}
+
+
+SCENARIOS = {
+    'posts:index': ('get', _none, _empty),
+    'posts:new_post': ('post', _none, _text),
+    'posts:follow_index': ('get', _none, _empty),
+    'posts:search': ('get', _none, lambda s: {'q': s.rng.choice(WORDS)}),
+    'posts:index_feed': ('get', lambda s: ['rss'], _empty),
+    'posts:group_feed': ('get', lambda s: [s.group(), 'atom'], _empty),
+    'posts:author_feed': ('get', lambda s: [s.author(), 'rss'], _empty),
+    'group': ('get', lambda s: [s.group()], _empty),
+    'posts:profile': ('get', lambda s: [s.author()], _empty),
+    'posts:profile_follow': ('get', lambda s: [s.author()], _empty),
+    'posts:profile_unfollow': ('get', lambda s: [s.author()], _empty),
+    'posts:profile_export': ('get', lambda s: [s.username], _empty),
+    'posts:post': ('get', lambda s: list(s.post()), _empty),
+    'posts:post_edit': ('get', lambda s: [s.username, s.own_post()], _empty),
+    'posts:post_delete': (
+        'get',
+        lambda s: [s.username, s.new_post().pk],
+        _empty,
+    ),
+    'posts:add_comment': ('post', lambda s: list(s.post()), _text),
+}
+
+
+def _work(dataset, jobs, seed):
+    session = Session(dataset, random.Random(seed))
+    return [session.request(name) for name in jobs]
+
+
+def _work_in_thread(dataset, jobs, seed):
+    try:
+        return _work(dataset, jobs, seed)
+    finally:
+        # У каждого потока свои соединения с базой.
+        connections.close_all()
+
+
+def run(names, per_view, concurrency, seed=0):
+    """
+    Отправляет ``per_view`` запросов к каждому view из ``names``
+    вперемешку из ``concurrency`` потоков и возвращает сводку.
+    """
+    dataset = Dataset()
+    jobs = [name for name in names for _ in range(per_view)]
+    random.Random(seed).shuffle(jobs)
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = _work(dataset, jobs, seed)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            parts = pool.map(
+                _work_in_thread,
+                [dataset] * concurrency,
+                [jobs[number::concurrency] for number in range(concurrency)],
+                [seed + number for number in range(concurrency)],
+            )
+            samples = [sample for part in parts for sample in part]
+    return summarize(samples, time.perf_counter() - started)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def _summary(samples, wall):
+    latencies = [elapsed * 1000 for _, elapsed, _, _ in samples]
+    queries = [count for _, _, count, _ in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(status >= 400 for _, _, _, status in samples),
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'rps': round(len(samples) / wall, 2),
+    }
+
+
+def summarize(samples, wall):
+    by_view = defaultdict(list)
+    for sample in samples:
+        by_view[sample[0]].append(sample)
+    return {
+        'seconds': round(wall, 3),
+        'total': _summary(samples, wall),
+        'views': {
+            name: _summary(rows, wall)
+            for name, rows in sorted(by_view.items())
+        },
+    }
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит старые записи в архивную таблицу, чтобы индексы '
+        'горячей таблицы оставались маленькими. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help='Возраст записи в днях, после которого она уходит в архив.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE
+        )
+        parser.add_argument('--pause', type=float, default=0.0)
+
+    def handle(self, *args, **options):
+        total = archive.archive(
+            timedelta(days=options['days']),
+            options['batch_size'],
+            options['pause'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'В архив перенесено: {total}'))
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from posts.loadtest import zipf_weights
+
+BACKENDS = (
+    ('LocMemCache', 'django.core.cache.backends.locmem.LocMemCache', ''),
+    (
+        'FileBasedCache',
+        'django.core.cache.backends.filebased.FileBasedCache',
+        'files',
+    ),
+    ('SQLiteCache', 'posts.sqlitecache.SQLiteCache', 'cache.sqlite3'),
+)
+PAYLOAD = 'x' * 4000
+
+# Настоящая версия ленты; процессы наследуют её при fork.
+_version = None
+
+
+def _bump(cache):
+    with _version.get_lock():
+        _version.value += 1
+        cache.set('version', _version.value)
+
+
+def work(backend, location, options, duration, keys, bump_share, miss_cost):
+    """
+    Цикл процесса-«воркера», как в шаблоне ленты: прочитать версию,
+    по ней фрагмент, при промахе «отрисовать» его за ``miss_cost`` секунд.
+    Иногда воркер сбрасывает версию, как сигнал о новой записи.
+    """
+    cache = import_string(backend)(location, {'OPTIONS': options})
+    rng = random.Random(os.getpid())
+    weights = zipf_weights(keys)
+    hits = misses = stale = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if rng.random() < bump_share:
+            _bump(cache)
+            continue
+        version = cache.get('version')
+        if version is None:
+            version = _version.value
+            cache.add('version', version)
+        if version < _version.value:
+            # Чужой сброс версии сюда не дошёл: страница устарела.
+            stale += 1
+        number = rng.choices(range(keys), cum_weights=weights)[0]
+        key = f'fragment:{version}:{number}'
+        if cache.get(key) is None:
+            misses += 1
+            time.sleep(miss_cost)
+            cache.set(key, PAYLOAD)
+        else:
+            hits += 1
+    return hits, misses, stale
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache, FileBasedCache и общий SQLiteCache под '
+        'нагрузкой нескольких процессов: чтений фрагментов в секунду, '
+        'долю попаданий и долю чтений устаревшей версии ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument(
+            '--keys',
+            type=int,
+            default=2000,
+            help='Число разных фрагментов (популярность по Ципфу).',
+        )
+        parser.add_argument(
+            '--bump-share',
+            type=float,
+            default=0.001,
+            help='Доля операций, сбрасывающих версию ленты.',
+        )
+        parser.add_argument(
+            '--miss-cost',
+            type=float,
+            default=2.0,
+            help='Время отрисовки фрагмента при промахе, мс.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'бэкенд':<16}{'чтений/с':>10}{'попаданий':>11}"
+            f"{'устаревших':>12}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, backend, location in BACKENDS:
+                if location:
+                    location = os.path.join(directory, location)
+                hits, misses, stale = self.run(backend, location, options)
+                reads = hits + misses
+                self.stdout.write(
+                    f"{name:<16}{reads / options['duration']:>10.0f}"
+                    f'{hits / max(reads, 1):>11.1%}'
+                    f'{stale / max(reads, 1):>12.1%}'
+                )
+
+    def run(self, backend, location, options):
+        global _version
+        _version = multiprocessing.Value('q', 0)
+        workers = options['workers']
+        cache_options = {'MAX_ENTRIES': options['keys'] * 10}
+        # fork: процессы наследуют общий счётчик версии.
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    work,
+                    backend,
+                    location,
+                    cache_options,
+                    options['duration'],
+                    options['keys'],
+                    options['bump_share'],
+                    options['miss_cost'] / 1000,
+                )
+                for _ in range(workers)
+            ]
+            results = [future.result() for future in futures]
+        return [sum(column) for column in zip(*results)]
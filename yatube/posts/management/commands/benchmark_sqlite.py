@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from posts.models import Comment, Post, User
+
+SEED_POSTS = 200
+
+
+def work(duration, write_share, reuse):
+    """Цикл процесса-«воркера»: чтение ленты или новый комментарий."""
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+    author_id = User.objects.values_list('pk', flat=True).first()
+    rng = random.Random(os.getpid())
+    reads = writes = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if rng.random() < write_share:
+                Comment.objects.create(
+                    post_id=rng.choice(post_ids),
+                    author_id=author_id,
+                    text='benchmark',
+                )
+                writes += 1
+            else:
+                list(Post.objects.select_related('author', 'group')[:11])
+                reads += 1
+        except OperationalError:
+            errors += 1
+        if not reuse:
+            # Как при CONN_MAX_AGE = 0: новое соединение на каждый запрос.
+            connections.close_all()
+    connections.close_all()
+    return reads, writes, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает чтение и запись в SQLite из нескольких процессов '
+        'без настроек и с SQLITE_PRAGMAS и постоянными соединениями. '
+        'Работает с копией базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument(
+            '--write-share',
+            type=float,
+            default=0.2,
+            help='Доля операций записи (по умолчанию 0.2).',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан на SQLite.')
+        modes = (
+            ('без настроек', {}, False),
+            ('WAL + pragmas + CONN_MAX_AGE', settings.SQLITE_PRAGMAS, True),
+        )
+        source = connection.settings_dict['NAME']
+        self.stdout.write(
+            f"{'режим':<30}{'чтений/с':>10}{'записей/с':>11}{'ошибок':>8}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (name, pragmas, reuse) in enumerate(modes):
+                path = os.path.join(directory, f'{number}.sqlite3')
+                self.copy(source, path)
+                reads, writes, errors = self.run(path, pragmas, reuse, options)
+                duration = options['duration']
+                self.stdout.write(
+                    f'{name:<30}{reads / duration:>10.0f}'
+                    f'{writes / duration:>11.0f}{errors:>8}'
+                )
+
+    def copy(self, source, path):
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+            dst.execute('PRAGMA journal_mode = delete')
+
+    def run(self, path, pragmas, reuse, options):
+        connections.close_all()
+        original = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = path
+        try:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                self.seed()
+                connections.close_all()
+                workers = options['workers']
+                # fork: процессы наследуют подменённую базу и настройки.
+                context = multiprocessing.get_context('fork')
+                with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                    futures = [
+                        pool.submit(
+                            work,
+                            options['duration'],
+                            options['write_share'],
+                            reuse,
+                        )
+                        for _ in range(workers)
+                    ]
+                    results = [future.result() for future in futures]
+        finally:
+            connections.close_all()
+            connection.settings_dict['NAME'] = original
+        return [sum(column) for column in zip(*results)]
+
+    def seed(self):
+        missing = SEED_POSTS - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username='benchmark')
+        Post.objects.bulk_create(
+            Post(text=f'benchmark {i}', author=author) for i in range(missing)
+        )
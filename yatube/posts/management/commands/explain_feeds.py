@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Post, Timeline
+from posts.paginators import CursorPaginator
+
+FEED_INDEXES = (
+    'post_date_idx',
+    'post_author_date_idx',
+    'post_group_date_idx',
+    'comment_post_created_idx',
+    'follow_author_user_idx',
+)
+
+
+def feed_queries(per_page=10):
+    """Запросы страниц лент в том виде, в каком их строят views."""
+    keyset = CursorPaginator.keyset
+    cursor = (timezone.now(), 1)
+    posts = Post.objects.select_related('author', 'group')
+    limit = per_page + 1
+    return {
+        'index': keyset(posts)[:limit],
+        'index ?after=': keyset(posts, cursor)[:limit],
+        'group_posts': keyset(posts.filter(group_id=1))[:limit],
+        'profile': keyset(posts.filter(author_id=1))[:limit],
+        'profile ?after=': keyset(posts.filter(author_id=1), cursor)[:limit],
+        'profile is_following': Follow.objects.filter(
+            user_id=1, author_id=2
+        ),
+        'post_view comments': Comment.objects.filter(post_id=1)
+        .select_related('author')
+        .order_by('created'),
+        'follow_index': keyset(
+            Timeline.objects.filter(user_id=1),
+            keys=('pub_date', 'post_id'),
+        ).select_related('post__author', 'post__group')[:limit],
+        'follow_index heavy authors': keyset(
+            posts.filter(author_id__in=[1, 2])
+        )[:limit],
+        'fan-out followers': Follow.objects.filter(author_id=1).values_list(
+            'user_id', flat=True
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает EXPLAIN QUERY PLAN запросов лент без индексов лент '
+        'и с ними.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for name in FEED_INDEXES:
+                    name = connection.ops.quote_name(name)
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
+            self.print_plans('Без индексов лент')
+            transaction.set_rollback(True)
+        self.print_plans('С индексами лент')
+
+    def print_plans(self, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in feed_queries().items():
+            self.stdout.write(self.style.MIGRATE_LABEL(f'  {name}'))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
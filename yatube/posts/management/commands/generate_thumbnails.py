@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее создаёт адаптивные варианты и заглушки для всех '
+        'изображений записей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help=(
+                'Число процессов (по умолчанию — число ядер); '
+                '0 — в этом процессе.'
+            ),
+        )
+        parser.add_argument('--chunk-size', type=int, default=64)
+
+    def handle(self, *args, **options):
+        post_ids = list(
+            Post.objects.exclude(image='')
+            .exclude(image__isnull=True)
+            .order_by()
+            .values_list('pk', flat=True)
+        )
+        if options['workers']:
+            # Дочерние процессы не должны наследовать открытое соединение.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                failed = self.report(
+                    pool.map(
+                        thumbnails.generate_safely,
+                        post_ids,
+                        chunksize=options['chunk_size'],
+                    )
+                )
+        else:
+            failed = self.report(map(thumbnails.generate_safely, post_ids))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Обработано изображений: {len(post_ids) - failed}, '
+                f'ошибок: {failed}'
+            )
+        )
+
+    def report(self, results):
+        failed = 0
+        for post_id, error in results:
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'Запись {post_id}: {error}')
+        return failed
@@ -0,0 +1,130 @@
+import json
+import os
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from posts import loadtest
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон: наполняет отдельную базу SQLite большим '
+        'набором данных и обходит все адреса posts/urls.py из нескольких '
+        'потоков. Печатает p50/p95/p99, число запросов к базе и '
+        'пропускную способность по каждому view.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=os.path.join(settings.BASE_DIR, 'loadtest.sqlite3'),
+            help='Файл базы для прогона; наполняется, если пуст.',
+        )
+        parser.add_argument(
+            '--reseed',
+            action='store_true',
+            help='Удалить базу и наполнить её заново.',
+        )
+        for name, default in loadtest.VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=730,
+            help='На сколько дней назад разбросаны даты записей.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Запросов к каждому view.',
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--views',
+            nargs='+',
+            choices=loadtest.SCENARIOS,
+            default=list(loadtest.SCENARIOS),
+            metavar='URL_NAME',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения p95.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Прогон рассчитан на SQLite.')
+        path = options['database']
+        if options['reseed'] and os.path.exists(path):
+            os.remove(path)
+        connections.close_all()
+        original = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = path
+        # Реплики смотрят на рабочую базу, а не на файл прогона.
+        try:
+            with override_settings(DATABASE_REPLICAS=[]):
+                result = self.run(options)
+        finally:
+            connections.close_all()
+            connection.settings_dict['NAME'] = original
+        self.report(result, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+
+    def run(self, options):
+        call_command('migrate', verbosity=0)
+        volumes = {name: options[name] for name in loadtest.VOLUMES}
+        if not User.objects.exists():
+            self.stdout.write(f'Наполнение базы: {volumes}')
+            loadtest.seed(
+                volumes, random.Random(options['seed']), options['days']
+            )
+        # Версии лент в кэше относятся к рабочей базе.
+        cache.clear()
+        result = loadtest.run(
+            options['views'],
+            options['requests'],
+            options['concurrency'],
+            options['seed'],
+        )
+        return {
+            'database': options['database'],
+            'rows': loadtest.counts(),
+            'concurrency': options['concurrency'],
+            **result,
+        }
+
+    def report(self, result, compare):
+        baseline = {}
+        if compare:
+            with open(compare, encoding='utf-8') as file:
+                baseline = json.load(file)['views']
+        self.stdout.write(
+            f"{'view':<24}{'p50':>8}{'p95':>8}{'p99':>8}"
+            f"{'запросов':>10}{'rps':>8}{'ошибок':>8}"
+            + (f"{'p95 было':>10}" if baseline else '')
+        )
+        for name, row in result['views'].items():
+            line = (
+                f"{name:<24}{row['p50_ms']:>8.1f}{row['p95_ms']:>8.1f}"
+                f"{row['p99_ms']:>8.1f}{row['queries']:>10.1f}"
+                f"{row['rps']:>8.1f}{row['errors']:>8}"
+            )
+            if name in baseline:
+                line += f"{baseline[name]['p95_ms']:>10.1f}"
+            self.stdout.write(line)
+        total = result['total']
+        self.stdout.write(
+            f"Всего {total['requests']} запросов за {result['seconds']} с, "
+            f"{total['rps']} запросов/с, p95 {total['p95_ms']} мс"
+        )
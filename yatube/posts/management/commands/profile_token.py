@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает подписанное значение заголовка X-Profile: запрос с ним '
+        'профилируется и без входа под сотрудником.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling.make_token())
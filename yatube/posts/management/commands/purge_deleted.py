@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import purge
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пачками скрытые записи, комментарии и аккаунты вместе '
+        'с файлами изображений. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.PURGE_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=settings.PURGE_PAUSE,
+            help='Пауза между пачками, секунд: даёт пройти другим записям.',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge.purge(options['batch_size'], options['pause'])
+        summary = ', '.join(
+            f'{name}: {total}' for name, total in sorted(deleted.items())
+        )
+        self.stdout.write(self.style.SUCCESS(f'Удалено — {summary or 0}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики подписчиков, подписок и записей.'
+
+    def handle(self, *args, **options):
+        total = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано: {total}'))
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import slowqueries
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит лог медленных запросов: сколько раз и сколько времени '
+        'занял каждый запрос по имени url и его план в SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument(
+            '--view',
+            action='append',
+            help='Только эти имена url, например posts:follow_index.',
+        )
+        parser.add_argument(
+            '--min-count',
+            type=int,
+            default=2,
+            help='Показывать запросы, попавшие в лог не реже стольких раз.',
+        )
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['log'], encoding='utf-8') as file:
+                report = slowqueries.aggregate(file)
+        except FileNotFoundError:
+            raise CommandError(f'Нет лога {options["log"]}.')
+        report = [
+            entry
+            for entry in report
+            if entry['count'] >= options['min_count']
+            and (not options['view'] or entry['view'] in options['view'])
+        ]
+        for entry in report[:options['limit']]:
+            self.stdout.write(
+                self.style.MIGRATE_LABEL(
+                    f"{entry['view']}: {entry['count']} раз, всего "
+                    f"{entry['total_ms']:g} мс, максимум "
+                    f"{entry['max_ms']:g} мс, наборов параметров "
+                    f"{entry['params']}"
+                )
+            )
+            self.stdout.write(f"  {entry['sql']}")
+            for line in entry['plan']:
+                if slowqueries.suspicious(line):
+                    line = self.style.WARNING(f'{line}  <- проверьте индекс')
+                self.stdout.write(f'    {line}')
+        if not report:
+            self.stdout.write('Повторяющихся медленных запросов нет.')
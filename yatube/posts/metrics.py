@@ -0,0 +1,222 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+FRAGMENT_PREFIX = 'template.cache.'
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram',
+        'Время ответа по имени url.',
+    ),
+    'yatube_db_queries': ('histogram', 'Запросов к базе за один ответ.'),
+    'yatube_fragment_cache_total': (
+        'counter',
+        'Чтения кэша фрагментов шаблонов по результату.',
+    ),
+    'yatube_fragment_cache_hit_ratio': (
+        'gauge',
+        'Доля попаданий в кэш фрагментов шаблонов.',
+    ),
+    'yatube_posts_created_total': ('counter', 'Созданные записи.'),
+    'yatube_comments_created_total': ('counter', 'Созданные комментарии.'),
+    'yatube_follows_created_total': ('counter', 'Созданные подписки.'),
+}
+SERIES = re.compile(r'^(\w+?)(_bucket|_sum|_count)?(\{.*\})?$')
+ARCHIVE = 'archive.json'
+
+_lock = threading.Lock()
+_values = defaultdict(float)
+_state = {'pid': os.getpid(), 'id': uuid.uuid4().hex, 'flushed': 0.0}
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    pairs = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    return f'{name}{{{pairs}}}'
+
+
+def _own_values():
+    # После fork потомок начинает с нуля: значения родителя уже лежат
+    # в его собственном файле.
+    if _state['pid'] != os.getpid():
+        _values.clear()
+        _state.update(pid=os.getpid(), id=uuid.uuid4().hex, flushed=0.0)
+    return _values
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        _own_values()[_series(name, labels)] += amount
+
+
+def observe(name, value, buckets, **labels):
+    """Добавляет наблюдение в гистограмму ``name``."""
+    with _lock:
+        values = _own_values()
+        for bound in (*buckets, '+Inf'):
+            if bound == '+Inf' or value <= bound:
+                values[_series(f'{name}_bucket', {**labels, 'le': bound})] += 1
+        values[_series(f'{name}_sum', labels)] += value
+        values[_series(f'{name}_count', labels)] += 1
+
+
+def _path():
+    # Случайная часть имени: новый воркер с тем же pid, что у умершего,
+    # не затрёт его файл.
+    name = f'worker-{_state["pid"]}-{_state["id"]}.json'
+    return os.path.join(settings.METRICS_DIR, name)
+
+
+def flush(force=False):
+    """
+    Сохраняет значения процесса в METRICS_DIR/worker-<pid>-<id>.json не
+    чаще раза в METRICS_FLUSH_SECONDS. Файлы всех процессов суммирует
+    render().
+    """
+    if not settings.METRICS_DIR:
+        return
+    now = time.monotonic()
+    with _lock:
+        values = _own_values()
+        fresh = now - _state['flushed'] < settings.METRICS_FLUSH_SECONDS
+        if fresh and not force:
+            return
+        _state['flushed'] = now
+        snapshot = dict(values)
+        path = _path()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    _write(path, snapshot)
+
+
+def _write(path, values):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(values, file)
+    os.replace(temporary, path)
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _directory_lock():
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, '.lock')
+    with open(path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _archive_dead():
+    """
+    Переносит значения завершившихся процессов в archive.json, чтобы
+    сумма счётчиков не уменьшалась и файлы не копились.
+    """
+    pattern = os.path.join(settings.METRICS_DIR, 'worker-*.json')
+    dead = [
+        path
+        for path in glob.glob(pattern)
+        if not _alive(int(os.path.basename(path).split('-')[1]))
+    ]
+    if not dead:
+        return
+    archive_path = os.path.join(settings.METRICS_DIR, ARCHIVE)
+    archive = defaultdict(float, _read(archive_path))
+    for path in dead:
+        for series, value in _read(path).items():
+            archive[series] += value
+    # Сначала архив, потом удаление: при сбое между ними значения
+    # посчитаются дважды, но не пропадут.
+    _write(archive_path, archive)
+    for path in dead:
+        os.remove(path)
+
+
+atexit.register(lambda: flush(force=True))
+
+
+def collect():
+    """Сумма значений всех процессов, в том числе завершившихся."""
+    if not settings.METRICS_DIR:
+        with _lock:
+            totals = defaultdict(float, _own_values())
+        return _with_ratio(totals)
+    flush(force=True)
+    totals = defaultdict(float)
+    # Под блокировкой: иначе параллельный сбор мог бы прочитать архив до
+    # переноса, а файл умершего процесса — уже после.
+    with _directory_lock():
+        _archive_dead()
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            for series, value in _read(path).items():
+                totals[series] += value
+    return _with_ratio(totals)
+
+
+def _with_ratio(totals):
+    hits = totals['yatube_fragment_cache_total{result="hit"}']
+    misses = totals['yatube_fragment_cache_total{result="miss"}']
+    if hits + misses:
+        totals['yatube_fragment_cache_hit_ratio'] = hits / (hits + misses)
+    return totals
+
+
+def _order(row):
+    # Ряды гистограммы по меткам, а бакеты — по возрастанию границы.
+    name, suffix, labels = SERIES.match(row[0]).groups()
+    le = re.search(r'le="([^"]+)"', labels or '')
+    bound = float(le.group(1)) if le else 0.0
+    return name, re.sub(r',?le="[^"]+"', '', labels or ''), suffix or '', bound
+
+
+def render():
+    """Значения в текстовом формате Prometheus."""
+    groups = defaultdict(list)
+    for series, value in collect().items():
+        groups[SERIES.match(series).group(1)].append((series, value))
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for series, value in sorted(groups[name], key=_order):
+            lines.append(f'{series} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def allowed(request):
+    """Метрики видят сотрудники и сборщик с токеном METRICS_TOKEN."""
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and constant_time_compare(header, f'Bearer {token}')
@@ -0,0 +1,165 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import budgets, metrics, profiling, slowqueries, timing
+from .routers import state, track_writes
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes: после запроса, который что-то записал в основную
+    базу, клиент REPLICA_PIN_SECONDS читает из неё, пока реплики
+    догоняют его изменения. Смотрим на сами записи, а не на метод:
+    подписка и удаление записи — ссылки GET.
+    """
+
+    cookie = 'pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state.pinned = self.is_pinned(request)
+        state.wrote = False
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(track_writes):
+                response = self.get_response(request)
+        finally:
+            state.pinned = False
+        if state.wrote:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.cookie,
+                str(time.time() + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(self.cookie, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает запросы к базе за время view и предупреждает в лог
+    posts.budgets, если их больше, чем разрешено в QUERY_BUDGETS.
+    Запросы потоковых ответов, читаемых после выхода из view, не
+    учитываются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with budgets.counting() as counter:
+            response = self.get_response(request)
+        # Число запросов берёт и MetricsMiddleware.
+        request.query_counter = counter
+        match = request.resolver_match
+        if match is not None:
+            budgets.check(match.view_name, counter)
+        return response
+
+
+class SlowQueryMiddleware:
+    """
+    Пишет в лог posts.slowqueries запросы к базе дольше SLOW_QUERY_MS
+    с планом SQLite; сводку по логу печатает manage.py slowqueries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slowqueries.logging_slow(request):
+            return self.get_response(request)
+
+
+class ServerTimingMiddleware:
+    """
+    Для доли запросов SERVER_TIMING_SAMPLE_RATE замеряет время SQL,
+    шаблонов и миниатюр, попадания в кэш и отдаёт их в заголовке
+    Server-Timing и строкой JSON в лог posts.timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with timing.recording() as timings:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = timing.header(timings, total)
+        timing.log(request, response, timings, total)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Пишет время ответа и число запросов к базе в гистограммы по имени
+    url. Стоит выше QueryBudgetMiddleware, чьим счётчиком пользуется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.observe(
+            'yatube_request_duration_seconds',
+            time.perf_counter() - started,
+            metrics.LATENCY_BUCKETS,
+            view=view,
+        )
+        counter = getattr(request, 'query_counter', None)
+        if counter is not None:
+            metrics.observe(
+                'yatube_db_queries',
+                counter.count,
+                metrics.QUERY_BUCKETS,
+                view=view,
+            )
+        metrics.flush()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Снимает профиль view вместе с шаблонами и ORM по запросу сотрудника
+    или по выборке (см. posts.profiling). Тому, кто попросил профиль
+    явно, имя файла возвращается в заголовке X-Profile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        sampler = getattr(request, 'profiler', None)
+        if sampler is not None:
+            name = profiling.save(
+                sampler.stop(), request.resolver_match.view_name
+            )
+            if request.profile_reason != 'sampled':
+                response['X-Profile'] = name
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reason = profiling.reason(request, request.resolver_match.view_name)
+        if reason is not None:
+            request.profile_reason = reason
+            request.profiler = profiling.start()
@@ -0,0 +1,114 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:54
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_invalid_follows(apps, schema_editor):
+    # До этой миграции база не мешала подписаться на себя или дважды
+    # на одного автора: такие строки не дали бы добавить ограничения.
+    Follow = apps.get_model('posts', 'Follow')
+    Follow.objects.filter(user_id=models.F('author_id')).delete()
+    first = (
+        Follow.objects.order_by()
+        .values('user', 'author')
+        .annotate(first=models.Min('pk'))
+        .values('first')
+    )
+    Follow.objects.exclude(pk__in=first).delete()
+
+
+def fill_timeline(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Timeline = apps.get_model('posts', 'Timeline')
+    for follow in Follow.objects.iterator():
+        posts = (
+            Post.objects.filter(author_id=follow.author_id)
+            .order_by('-pub_date')
+            .values_list('pk', 'pub_date')[: settings.TIMELINE_BACKFILL_SIZE]
+        )
+        Timeline.objects.bulk_create(
+            [
+                Timeline(user_id=follow.user_id, post_id=pk, pub_date=date)
+                for pk, date in posts
+            ],
+            batch_size=settings.TIMELINE_BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_auto_20210703_1941'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('pub_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(drop_invalid_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    _negated=True,
+                    user=django.db.models.expressions.F('author'),
+                ),
+                name='user_not_author',
+            ),
+        ),
+        migrations.AddField(
+            model_name='timeline',
+            name='post',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='timeline',
+                to='posts.Post',
+            ),
+        ),
+        migrations.AddField(
+            model_name='timeline',
+            name='user',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='timeline',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='timeline',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline'
+            ),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
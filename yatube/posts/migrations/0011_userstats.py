@@ -0,0 +1,76 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    count = models.Count('pk')
+    followers = Follow.objects.order_by().values('author').annotate(n=count)
+    following = Follow.objects.order_by().values('user').annotate(n=count)
+    posts = Post.objects.order_by().values('author').annotate(n=count)
+    followers = {row['author']: row['n'] for row in followers}
+    following = {row['user']: row['n'] for row in following}
+    posts = {row['author']: row['n'] for row in posts}
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=pk,
+                followers=followers.get(pk, 0),
+                following=following.get(pk, 0),
+                posts=posts.get(pk, 0),
+            )
+            for pk in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0010_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                (
+                    'user',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='stats',
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    'followers',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='Подписчиков'
+                    ),
+                ),
+                (
+                    'following',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='Подписок'
+                    ),
+                ),
+                (
+                    'posts',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='Записей'
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+def fill_comments_count(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    counted = (
+        Comment.objects.filter(post=models.OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=models.Count('pk'))
+        .values('total')
+    )
+    Post.objects.filter(pk__in=Comment.objects.values('post')).update(
+        comments_count=models.Subquery(counted)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='Комментариев'
+            ),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
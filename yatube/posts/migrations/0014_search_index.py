@@ -0,0 +1,59 @@
+from django.db import migrations
+
+KINDS = (
+    ('post', 1, 'posts_post', 'text'),
+    ('comment', 2, 'posts_comment', 'text'),
+    ('group', 3, 'posts_group', 'title'),
+)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        'text, kind UNINDEXED, object_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for kind, code, table, column in KINDS:
+        insert = (
+            'INSERT INTO posts_search (rowid, text, kind, object_id) '
+            f"VALUES (new.id * 4 + {code}, new.{column}, '{kind}', new.id);"
+        )
+        delete = f'DELETE FROM posts_search WHERE rowid = old.id * 4 + {code};'
+        schema_editor.execute(
+            f'CREATE TRIGGER posts_search_{kind}_ai AFTER INSERT ON {table} '
+            f'BEGIN {insert} END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER posts_search_{kind}_au AFTER UPDATE OF {column} '
+            f'ON {table} BEGIN {delete} {insert} END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER posts_search_{kind}_ad AFTER DELETE ON {table} '
+            f'BEGIN {delete} END'
+        )
+        schema_editor.execute(
+            'INSERT INTO posts_search (rowid, text, kind, object_id) '
+            f"SELECT id * 4 + {code}, {column}, '{kind}', id FROM {table}"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for kind, code, table, column in KINDS:
+        for event in ('ai', 'au', 'ad'):
+            schema_editor.execute(
+                f'DROP TRIGGER IF EXISTS posts_search_{kind}_{event}'
+            )
+    schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [migrations.RunPython(create_index, drop_index)]
@@ -0,0 +1,153 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:19
+
+from django.conf import settings
+import django.db.models.deletion
+from django.db import migrations, models
+
+POST_DELETE = 'DELETE FROM posts_search WHERE rowid = old.id * 4 + 1;'
+POST_INSERT = (
+    'INSERT INTO posts_search (rowid, text, kind, object_id) '
+    "VALUES (new.id * 4 + 1, new.text, 'post', new.id);"
+)
+
+
+def archive_triggers(apps, schema_editor):
+    # Запись в архиве ищется под тем же rowid, что и в горячей таблице:
+    # перенос не должен ни удалять её из индекса, ни дублировать.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS posts_search_post_ad')
+    schema_editor.execute(
+        'CREATE TRIGGER posts_search_post_ad AFTER DELETE ON posts_post '
+        'WHEN NOT EXISTS '
+        '(SELECT 1 FROM posts_archivedpost WHERE id = old.id) '
+        f'BEGIN {POST_DELETE} END'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER posts_search_archive_ai '
+        'AFTER INSERT ON posts_archivedpost '
+        'WHEN NOT EXISTS (SELECT 1 FROM posts_post WHERE id = new.id) '
+        f'BEGIN {POST_INSERT} END'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER posts_search_archive_ad '
+        'AFTER DELETE ON posts_archivedpost '
+        f'BEGIN {POST_DELETE} END'
+    )
+
+
+def drop_archive_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in ('post_ad', 'archive_ai', 'archive_ad'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS posts_search_{name}')
+    schema_editor.execute(
+        'CREATE TRIGGER posts_search_post_ad AFTER DELETE ON posts_post '
+        f'BEGIN {POST_DELETE} END'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='comments',
+                to='posts.Post',
+            ),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('text', models.TextField(verbose_name='Текст')),
+                (
+                    'image',
+                    models.ImageField(
+                        blank=True, null=True, upload_to='posts/'
+                    ),
+                ),
+                (
+                    'comments_count',
+                    models.PositiveIntegerField(
+                        default=0, editable=False, verbose_name='Комментариев'
+                    ),
+                ),
+                (
+                    'image_variants',
+                    models.TextField(blank=True, editable=False),
+                ),
+                (
+                    'image_placeholder',
+                    models.TextField(blank=True, editable=False),
+                ),
+                (
+                    'deleted_at',
+                    models.DateTimeField(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        verbose_name='Удалена',
+                    ),
+                ),
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('pub_date', models.DateTimeField(verbose_name='Дата')),
+                (
+                    'author',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='archived_posts',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='Автор',
+                    ),
+                ),
+                (
+                    'group',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name='archived_posts',
+                        to='posts.Group',
+                        verbose_name='Группа',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['pub_date'], name='archive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(
+                fields=['author', 'pub_date'], name='archive_author_date_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(
+                fields=['group', 'pub_date'], name='archive_group_date_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(
+                condition=models.Q(deleted_at__isnull=False),
+                fields=['deleted_at'],
+                name='archive_deleted_idx',
+            ),
+        ),
+        migrations.RunPython(archive_triggers, drop_archive_triggers),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_archived_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fanout_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
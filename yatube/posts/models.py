@@ -1,6 +1,9 @@
+import json
+from contextlib import contextmanager
+
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models.query_utils import Q
+from django.db import models, transaction
+from django.db.models import F, Q
 
 User = get_user_model()
 
@@ -14,8 +17,66 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class LiveManager(models.Manager):
+    """Скрывает удалённое: строки остаются до фоновой очистки."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class PostBase(models.Model):
+    """Общие поля и разметка горячих и архивных записей."""
+
+    is_archived = False
+    # Готовая миниатюра sorl, если вариантов нет; см. thumbnails.prefetch.
+    card_thumbnail = None
+
     text = models.TextField('Текст')
+    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False
+    )
+    image_variants = models.TextField(blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    deleted_at = models.DateTimeField(
+        'Удалена', null=True, blank=True, editable=False
+    )
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self) -> str:
+        return self.text
+
+    @property
+    def image_sources(self):
+        """srcset по типам вариантов изображения и самый крупный src."""
+        if not self.image or not self.image_variants:
+            return None
+        storage = self.image.storage
+        srcsets = {}
+        src = None
+        for variant in json.loads(self.image_variants):
+            url = storage.url(variant['name'])
+            srcsets.setdefault(variant['type'], []).append(
+                f"{url} {variant['width']}w"
+            )
+            if variant['type'] != 'image/webp':
+                src = url
+        fallback_type = next(
+            kind for kind in srcsets if kind != 'image/webp'
+        )
+        return {
+            'webp': ', '.join(srcsets.pop('image/webp', [])),
+            'fallback': ', '.join(srcsets[fallback_type]),
+            'src': src,
+        }
+
+
+class Post(PostBase):
     pub_date = models.DateTimeField('Дата', auto_now_add=True)
     author = models.ForeignKey(
         User,
@@ -31,24 +92,128 @@ class Post(models.Model):
         blank=True,
         null=True,
     )
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_date_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='post_deleted_idx',
+                condition=Q(deleted_at__isnull=False),
+            ),
+        ]
 
-    def __str__(self) -> str:
-        return self.text
+    def save(self, *args, **kwargs):
+        # comments_count меняют только сигналы комментариев через F():
+        # сохранение загруженной ранее записи не должно его затирать.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        # Сигналы post_save сдвигают UserStats и раскладывают ленты:
+        # запись и её счётчики фиксируются вместе или не фиксируются вовсе.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+@contextmanager
+def explicit_pub_date():
+    """Даёт bulk_create сохранить дату публикации из источника."""
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class ArchivedPost(PostBase):
+    """
+    Холодный ярус: записи старше ARCHIVE_AFTER_DAYS переносятся сюда
+    с прежним id, чтобы индексы posts_post оставались маленькими.
+    Архивные записи только читаются.
+    """
+
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    pub_date = models.DateTimeField('Дата')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='archived_posts',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        verbose_name='Группа',
+        related_name='archived_posts',
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['pub_date'], name='archive_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='archive_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='archive_group_date_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='archive_deleted_idx',
+                condition=Q(deleted_at__isnull=False),
+            ),
+        ]
+
+    @property
+    def comments(self):
+        return Comment.objects.filter(post_id=self.pk)
 
 
 class Comment(models.Model):
+    # Комментарии архивных записей остаются в этой таблице с прежним
+    # post_id, поэтому внешний ключ в базе не проверяется.
     post = models.ForeignKey(
-        Post, on_delete=models.CASCADE, related_name='comments'
+        Post,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        db_constraint=False,
     )
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='comments'
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='comment_deleted_idx',
+                condition=Q(deleted_at__isnull=False),
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -65,6 +230,67 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_follow'
             ),
             models.CheckConstraint(
-                check=~Q('user', 'author'), name='user_not_author'
+                check=~Q(user=F('author')), name='user_not_author'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
             ),
         ]
+
+    def save(self, *args, **kwargs):
+        # Как у Post: подписка и сдвиг счётчиков — одна транзакция.
+        # Удаление сигналы уже выполняют внутри транзакции Collector.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='timeline'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    following = models.PositiveIntegerField('Подписок', default=0)
+    posts = models.PositiveIntegerField('Записей', default=0)
+    # Когда подписчиков снова стало не больше TIMELINE_FANOUT_LIMIT.
+    # Более ранние записи могли не попасть в ленты и сливаются при чтении.
+    fanout_since = models.DateTimeField(null=True, blank=True, editable=False)
+
+
+class AccountRemoval(models.Model):
+    """Пользователь, чьи данные скрыты и ждут фоновой очистки."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='removal',
+    )
+    requested = models.DateTimeField(auto_now_add=True)
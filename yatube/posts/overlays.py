@@ -0,0 +1,38 @@
+import re
+from functools import wraps
+
+from django.template.loader import render_to_string
+
+OWNER_CONTROLS = re.compile(r'<!--owner-controls:(\d+):(\d+)-->')
+
+
+def fill_owner_controls(content, user):
+    """Подставляет кнопки автора вместо меток в общей разметке ленты."""
+
+    def replace(match):
+        author_id, post_id = match.groups()
+        if not user.is_authenticated or int(author_id) != user.pk:
+            return ''
+        return render_to_string(
+            'posts/includes/owner_controls.html',
+            {'username': user.username, 'post_id': post_id},
+        )
+
+    return OWNER_CONTROLS.sub(replace, content)
+
+
+def personalize(view):
+    """
+    Ленты кэшируются одной копией на всех посетителей, а личные части
+    страницы заполняются после выборки из кэша.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            content = response.content.decode(response.charset)
+            response.content = fill_owner_controls(content, request.user)
+        return response
+
+    return wrapper
@@ -0,0 +1,159 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def pack_cursor(*values):
+    raw = '|'.join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def encode_cursor(post):
+    return pack_cursor(post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(token):
+    try:
+        pub_date, pk = unpack_cursor(token)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Пагинация по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Страница выбирается по непрозрачным токенам ``?after=`` и ``?before=``,
+    поэтому запрос к любой странице — это один диапазонный проход по
+    индексу. Навигация строится по ``page.next_cursor`` и
+    ``page.previous_cursor``: методы ``Page.has_next()`` и ``page_range``
+    унаследованы от ``Paginator`` и по-прежнему считают COUNT.
+    """
+
+    encode_cursor = staticmethod(encode_cursor)
+    decode_cursor = staticmethod(decode_cursor)
+
+    def get_page(self, number=None, after=None, before=None):
+        if after:
+            cursor = self.decode_cursor(after)
+            if cursor is not None:
+                page = self._page_after(cursor)
+                page.cursor = f'after:{after}'
+                return page
+        if before:
+            cursor = self.decode_cursor(before)
+            if cursor is not None:
+                page = self._page_before(cursor)
+                if page.object_list:
+                    page.cursor = f'before:{before}'
+                    return page
+        return self._page_by_number(number)
+
+    @staticmethod
+    def keyset(
+        queryset, cursor=None, descending=True, keys=('pub_date', 'pk')
+    ):
+        date_key, id_key = keys
+        if descending:
+            queryset = queryset.order_by(f'-{date_key}', f'-{id_key}')
+            lookup = 'lt'
+        else:
+            queryset = queryset.order_by(date_key, id_key)
+            lookup = 'gt'
+        if cursor is not None:
+            pub_date, pk = cursor
+            # Условие на pub_date вынесено отдельно, чтобы SQLite взял
+            # диапазон по индексу, а не объединение двух поисков.
+            queryset = queryset.filter(
+                Q(**{f'{date_key}__{lookup}e': pub_date}),
+                Q(**{f'{date_key}__{lookup}': pub_date})
+                | Q(**{f'{id_key}__{lookup}': pk}),
+            )
+        return queryset
+
+    def fetch(self, cursor=None, descending=True, offset=0):
+        posts = self.keyset(self.object_list, cursor, descending)
+        return list(posts[offset:offset + self.per_page + 1])
+
+    def _page_by_number(self, number):
+        # Старые ссылки ``?page=N`` продолжают работать: это OFFSET,
+        # но без COUNT, а дальше навигация идёт уже по курсорам.
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        rows = self.fetch(offset=(number - 1) * self.per_page)
+        return self._build_page(
+            rows[:self.per_page],
+            number,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def _page_after(self, cursor):
+        rows = self.fetch(cursor)
+        return self._build_page(
+            rows[:self.per_page],
+            None,
+            has_next=len(rows) > self.per_page,
+            has_previous=True,
+        )
+
+    def _page_before(self, cursor):
+        rows = self.fetch(cursor, descending=False)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._build_page(
+            rows, None, has_next=True, has_previous=has_previous
+        )
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        page = Page(rows, number, self)
+        page.cursor = f'page:{number}'
+        page.next_cursor = (
+            self.encode_cursor(rows[-1]) if has_next and rows else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0]) if has_previous and rows else None
+        )
+        return page
+
+
+class TieredPaginator(CursorPaginator):
+    """
+    Лента из горячей таблицы и архива. Старые даты бывают и в горячей
+    таблице (импорт, записи до запуска архивации), поэтому обе части
+    читаются по одному курсору и сливаются по (pub_date, id), как в
+    TimelinePaginator.
+    """
+
+    def __init__(self, object_list, archive, per_page):
+        super().__init__(object_list, per_page)
+        self.archive = archive
+
+    def fetch(self, cursor=None, descending=True, offset=0):
+        limit = offset + self.per_page + 1
+        rows = [
+            row
+            for tier in (self.object_list, self.archive)
+            for row in self.keyset(tier, cursor, descending)[:limit]
+        ]
+        rows.sort(key=lambda row: (row.pub_date, row.pk), reverse=descending)
+        return rows[offset:limit]
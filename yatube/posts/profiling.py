@@ -0,0 +1,119 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core import signing
+
+SALT = 'posts.profiling'
+HEADER = 'HTTP_X_PROFILE'
+
+_counters = defaultdict(itertools.count)
+_files = itertools.count()
+_lock = threading.Lock()
+
+
+class Sampler(threading.Thread):
+    """
+    Раз в ``interval`` секунд снимает стек потока ``thread_id`` через
+    sys._current_frames(): профилируемый код не замедляется трассировкой,
+    а работает и под многопоточным сервером, в отличие от сигналов.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+        return self.stacks
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    path = code.co_filename.split(os.sep)
+    return f'{code.co_name} ({"/".join(path[-2:])}:{code.co_firstlineno})'
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def make_token():
+    """Подписанное значение заголовка X-Profile для curl и скриптов."""
+    return signing.dumps('profile', salt=SALT)
+
+
+def _signed(request):
+    token = request.META.get(HEADER)
+    if not token:
+        return False
+    try:
+        signing.loads(
+            token, salt=SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _sampled(view_name):
+    every = settings.PROFILE_SAMPLE_EVERY.get(view_name)
+    if not every:
+        return False
+    with _lock:
+        return next(_counters[view_name]) % every == 0
+
+
+def reason(request, view_name):
+    """
+    Почему запрос нужно профилировать: сотрудник передал ?profile=1,
+    пришёл подписанный заголовок X-Profile или это каждый N-й запрос к
+    view из PROFILE_SAMPLE_EVERY. None — профилировать не нужно.
+    """
+    if request.GET.get('profile') == '1' and request.user.is_staff:
+        return 'staff'
+    if _signed(request):
+        return 'signed'
+    if _sampled(view_name):
+        return 'sampled'
+    return None
+
+
+def start():
+    sampler = Sampler(threading.get_ident(), settings.PROFILE_INTERVAL)
+    sampler.start()
+    return sampler
+
+
+def save(stacks, view_name):
+    """
+    Сохраняет стеки в формате collapsed stacks (flamegraph.pl,
+    speedscope) в PROFILE_DIR и возвращает имя файла.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    view = view_name.replace(':', '-')
+    name = f'{stamp}-{view}-{os.getpid()}-{next(_files)}.folded'
+    with open(os.path.join(settings.PROFILE_DIR, name), 'w') as file:
+        for stack, samples in stacks.most_common():
+            file.write(f'{stack} {samples}\n')
+    return name
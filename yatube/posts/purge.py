@@ -0,0 +1,190 @@
+import time
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+
+from . import cache_versions, stats, thumbnails, timeline
+from .models import (
+    AccountRemoval,
+    ArchivedPost,
+    Comment,
+    Follow,
+    Post,
+    Timeline,
+    User,
+    UserStats,
+)
+
+
+def delete_post(post):
+    """Скрывает запись сразу; строки и файлы удалит purge()."""
+    with transaction.atomic():
+        hidden = Post.objects.filter(pk=post.pk).update(
+            deleted_at=timezone.now()
+        )
+        if hidden:
+            stats.bump(post.author_id, posts=-1)
+    if hidden:
+        cache_versions.bump_post(post)
+
+
+def remove_user(user):
+    """
+    Скрывает аккаунт, его записи и комментарии несколькими UPDATE без
+    загрузки строк; сами строки удаляются позже пачками в purge().
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        _, created = AccountRemoval.objects.get_or_create(user=user)
+        if not created:
+            return
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        touched = set()
+        for model in (Post, ArchivedPost):
+            posts = model.objects.filter(author=user)
+            touched |= set(
+                posts.order_by()
+                .values_list('author_id', 'group_id')
+                .distinct()
+            )
+            posts.update(deleted_at=now)
+        UserStats.objects.filter(user=user).update(posts=0)
+
+        Comment.objects.filter(author=user).update(deleted_at=now)
+        hidden = Comment.all_objects.filter(author=user, deleted_at=now)
+        per_post = (
+            hidden.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        for model in (Post, ArchivedPost):
+            commented = model.objects.filter(pk__in=hidden.values('post'))
+            touched |= set(
+                commented.order_by()
+                .values_list('author_id', 'group_id')
+                .distinct()
+            )
+            commented.update(
+                comments_count=F('comments_count')
+                - Subquery(per_post, output_field=IntegerField())
+            )
+    cache_versions.bump(
+        'index',
+        *{f'author:{author_id}' for author_id, _ in touched},
+        *{f'group:{group_id}' for _, group_id in touched if group_id},
+    )
+
+
+def _delete_batches(queryset, batch_size, pause, before=None):
+    """
+    Удаляет строки ``queryset`` пачками по ``batch_size``, каждую в своей
+    короткой транзакции, чтобы не держать блокировку записи.
+    """
+    model = queryset.model
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.order_by().values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                return total
+            if before is not None:
+                before(ids)
+            # Зависимые строки к этому моменту уже удалены, а сигналы
+            # пересчитали бы то, что скрытие уже учло: сборщик каскада
+            # здесь не нужен.
+            batch = model._base_manager.filter(pk__in=ids)
+            batch._raw_delete(batch.db)
+        total += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def _drop_post_children(ids, model=Post):
+    for child in (Comment, Timeline):
+        children = child._base_manager.filter(post_id__in=ids)
+        children._raw_delete(children.db)
+    posts = list(
+        model.all_objects.filter(pk__in=ids).only('image', 'image_variants')
+    )
+
+    def unlink():
+        for post in posts:
+            thumbnails.delete_files(post)
+
+    transaction.on_commit(unlink)
+
+
+def _unfollow(ids):
+    pairs = Follow.objects.filter(pk__in=ids).values_list(
+        'user_id', 'author_id'
+    )
+    following, followers = Counter(), Counter()
+    for user_id, author_id in pairs:
+        following[user_id] += 1
+        followers[author_id] += 1
+    for user_id, total in following.items():
+        stats.bump(user_id, following=-total)
+    for author_id, total in followers.items():
+        stats.bump(author_id, followers=-total)
+        timeline.settle(author_id, total)
+    cache_versions.bump(*(f'follow:{user_id}' for user_id in following))
+
+
+def purge(batch_size, pause=0):
+    """Удаляет скрытые записи, комментарии и аккаунты пачками."""
+    posts = Post.all_objects.filter(deleted_at__isnull=False)
+    archived = ArchivedPost.all_objects.filter(deleted_at__isnull=False)
+    users = AccountRemoval.objects.values('user')
+    steps = (
+        ('comments', Comment.all_objects.filter(deleted_at__isnull=False)),
+        ('comments', Comment.all_objects.filter(post__in=posts)),
+        (
+            'comments',
+            Comment.all_objects.filter(post_id__in=archived.values('pk')),
+        ),
+        ('timeline', Timeline.objects.filter(post__in=posts)),
+        ('timeline', Timeline.objects.filter(user__in=users)),
+        ('follows', Follow.objects.filter(user__in=users)),
+        ('follows', Follow.objects.filter(author__in=users)),
+        ('posts', posts),
+        ('archived', archived),
+    )
+    hooks = {
+        'follows': _unfollow,
+        'posts': _drop_post_children,
+        'archived': partial(_drop_post_children, model=ArchivedPost),
+    }
+    deleted = Counter()
+    for name, queryset in steps:
+        deleted[name] += _delete_batches(
+            queryset, batch_size, pause, before=hooks.get(name)
+        )
+    # Аккаунты уже без записей, комментариев и подписок: каскаду
+    # остаётся удалить лишь несколько служебных строк.
+    for removal in AccountRemoval.objects.select_related('user'):
+        with transaction.atomic():
+            removal.user.delete()
+        deleted['users'] += 1
+    deleted['comments'] += _delete_batches(
+        _orphan_comments(), batch_size, pause
+    )
+    return deleted
+
+
+def _orphan_comments():
+    """
+    Комментарии к записям, которых нет ни в горячей таблице, ни в архиве.
+    Comment.post не держит внешний ключ в базе, поэтому такие строки
+    оставляет любое удаление записи в обход каскада ORM, например
+    удаление ArchivedPost, на который каскад Comment не настроен.
+    """
+    return Comment.all_objects.exclude(
+        post_id__in=Post.all_objects.values('pk')
+    ).exclude(post_id__in=ArchivedPost.all_objects.values('pk'))
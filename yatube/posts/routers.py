@@ -0,0 +1,60 @@
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+
+state = threading.local()
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def reads_from_replica():
+    return getattr(state, 'replica', False) and not getattr(
+        state, 'pinned', False
+    )
+
+
+def replica_reads(view):
+    """Чтения модели внутри представления могут идти на реплику."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica = False
+
+    return wrapper
+
+
+def track_writes(execute, sql, params, many, context):
+    """execute_wrapper основной базы: отмечает, что запрос что-то записал."""
+    if sql.lstrip().upper().startswith(WRITES):
+        state.wrote = True
+    return execute(sql, params, many, context)
+
+
+class ReplicaRouter:
+    """
+    Запись — всегда в основную базу. Чтение лент из представлений под
+    ``replica_reads`` — на случайную из DATABASE_REPLICAS, если клиент
+    недавно ничего не менял (см. ReplicaPinMiddleware).
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not reads_from_replica():
+            return None
+        if model._meta.app_label not in settings.REPLICA_APPS:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,252 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedPost, Comment, Group, Post
+from .paginators import CursorPaginator, pack_cursor, unpack_cursor
+
+TABLE = 'posts_search'
+
+# rowid документа в индексе однозначно выводится из вида и id объекта,
+# поэтому триггерам не нужен поиск по неиндексируемым колонкам.
+KINDS = {'post': 1, 'comment': 2, 'group': 3}
+SOURCES = {
+    'post': ('posts_post', 'text'),
+    'comment': ('posts_comment', 'text'),
+    'group': ('posts_group', 'title'),
+}
+# Архивная запись ищется как 'post' под тем же rowid. Пока при переносе
+# строка есть в обеих таблицах, триггеры индекс не трогают.
+ARCHIVE = 'posts_archivedpost'
+# Скрытое мягким удалением уходит из индекса сразу, запись — вместе с
+# комментариями: иначе LIMIT страницы поиска считал бы и их, а
+# load_objects отбрасывал бы уже после него.
+HIDDEN = (
+    ('post', 'posts_post', 'post'),
+    ('archive', ARCHIVE, 'post'),
+    ('comment', 'posts_comment', 'comment'),
+)
+LIVE_POSTS = (
+    'SELECT id FROM posts_post WHERE deleted_at IS NULL UNION ALL '
+    f'SELECT id FROM {ARCHIVE} WHERE deleted_at IS NULL'
+)
+LIVE = {
+    'post': 'WHERE deleted_at IS NULL',
+    'comment': f'WHERE deleted_at IS NULL AND post_id IN ({LIVE_POSTS})',
+    'group': '',
+}
+WORD = re.compile(r'\w+')
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def rowid(kind, column='id'):
+    return f'{column} * {len(KINDS) + 1} + {KINDS[kind]}'
+
+
+def _insert(kind, column):
+    return (
+        f'INSERT INTO {TABLE} (rowid, text, kind, object_id) VALUES '
+        f"({rowid(kind, 'new.id')}, new.{column}, '{kind}', new.id);"
+    )
+
+
+def _delete(kind):
+    return f"DELETE FROM {TABLE} WHERE rowid = {rowid(kind, 'old.id')};"
+
+
+def _hide(name, table, kind):
+    statements = _delete(kind)
+    if kind == 'post':
+        statements += (
+            f' DELETE FROM {TABLE} WHERE rowid IN '
+            f"(SELECT {rowid('comment')} FROM posts_comment "
+            'WHERE post_id = old.id);'
+        )
+    return (
+        f'CREATE TRIGGER IF NOT EXISTS {TABLE}_{name}_hide '
+        f'AFTER UPDATE OF deleted_at ON {table} '
+        f'WHEN new.deleted_at IS NOT NULL BEGIN {statements} END'
+    )
+
+
+def schema_sql():
+    statements = [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+        'text, kind UNINDEXED, object_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for kind, (table, column) in SOURCES.items():
+        insert, delete = _insert(kind, column), _delete(kind)
+        trigger = f'CREATE TRIGGER IF NOT EXISTS {TABLE}_{kind}'
+        archived = ''
+        if kind == 'post':
+            archived = (
+                f'WHEN NOT EXISTS (SELECT 1 FROM {ARCHIVE} WHERE id = old.id) '
+            )
+        statements += [
+            f'{trigger}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+            f'{trigger}_au AFTER UPDATE OF {column} ON {table} '
+            f'BEGIN {delete} {insert} END',
+            f'{trigger}_ad AFTER DELETE ON {table} '
+            f'{archived}BEGIN {delete} END',
+        ]
+    trigger = f'CREATE TRIGGER IF NOT EXISTS {TABLE}_archive'
+    statements += [
+        f'{trigger}_ai AFTER INSERT ON {ARCHIVE} '
+        'WHEN NOT EXISTS (SELECT 1 FROM posts_post WHERE id = new.id) '
+        f"BEGIN {_insert('post', 'text')} END",
+        f"{trigger}_ad AFTER DELETE ON {ARCHIVE} BEGIN {_delete('post')} END",
+    ]
+    statements += [_hide(*hidden) for hidden in HIDDEN]
+    return statements
+
+
+def install(using='default', **kwargs):
+    """
+    Создаёт индекс и триггеры, если их нет. Вызывается после migrate:
+    SQLite удаляет триггеры вместе с таблицей, которую миграции
+    пересоздают при изменении полей.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        for statement in schema_sql():
+            cursor.execute(statement)
+
+
+def rebuild():
+    """Заполняет индекс заново одним INSERT ... SELECT на источник."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, (table, column) in SOURCES.items():
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text, kind, object_id) '
+                f"SELECT {rowid(kind)}, {column}, '{kind}', id FROM {table} "
+                f'{LIVE[kind]}'
+            )
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, kind, object_id) '
+            f"SELECT {rowid('post')}, text, 'post', id FROM {ARCHIVE} "
+            f"{LIVE['post']}"
+        )
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """Слова запроса как префиксы: пользовательский синтаксис FTS5 не нужен."""
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def filter_queryset(queryset, kind, query):
+    """Ограничивает queryset объектами, найденными в индексе."""
+    match = match_expression(query)
+    if not match or not available():
+        return queryset.none()
+    return queryset.filter(
+        pk__in=RawSQL(
+            f'SELECT object_id FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s AND kind = %s',
+            (match, kind),
+        )
+    )
+
+
+class SearchHit:
+    def __init__(self, rowid, kind, object_id, score):
+        self.rowid = rowid
+        self.kind = kind
+        self.object_id = object_id
+        self.score = score
+        self.object = None
+
+
+def _post_author():
+    """Автор записи комментария, где бы она ни лежала: в ленте или архиве."""
+    return Coalesce(
+        *(
+            Subquery(
+                model.objects.filter(pk=OuterRef('post_id')).values(
+                    'author__username'
+                )[:1]
+            )
+            for model in (Post, ArchivedPost)
+        )
+    )
+
+
+def load_objects(hits):
+    querysets = {
+        'post': Post.objects.select_related('author', 'group'),
+        'comment': Comment.objects.annotate(post_author=_post_author())
+        .filter(post_author__isnull=False)
+        .select_related('author'),
+        'group': Group.objects.all(),
+    }
+    for kind, queryset in querysets.items():
+        ids = [hit.object_id for hit in hits if hit.kind == kind]
+        if ids:
+            objects = queryset.in_bulk(ids)
+            if kind == 'post' and len(objects) < len(ids):
+                objects.update(
+                    ArchivedPost.objects.select_related(
+                        'author', 'group'
+                    ).in_bulk(set(ids) - set(objects))
+                )
+            for hit in hits:
+                if hit.kind == kind:
+                    hit.object = objects.get(hit.object_id)
+    return [hit for hit in hits if hit.object is not None]
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная пагинация результатов по ключу (bm25, rowid)."""
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page)
+        self.match = match_expression(query)
+
+    @staticmethod
+    def encode_cursor(hit):
+        return pack_cursor(repr(hit.score), hit.rowid)
+
+    @staticmethod
+    def decode_cursor(token):
+        try:
+            score, pk = unpack_cursor(token)
+            return float(score), int(pk)
+        except (TypeError, ValueError):
+            return None
+
+    def fetch(self, cursor=None, descending=True, offset=0):
+        if not self.match or not available():
+            return []
+        # «Вперёд» — от лучших совпадений (меньший bm25) к худшим.
+        order, lookup = ('', '>') if descending else (' DESC', '<')
+        where, params = '', [self.match]
+        if cursor is not None:
+            score, pk = cursor
+            where = (
+                f'WHERE score {lookup} %s '
+                f'OR (score = %s AND rowid {lookup} %s)'
+            )
+            params += [score, score, pk]
+        sql = (
+            f'SELECT rowid, kind, object_id, score FROM ('
+            f'SELECT rowid, kind, object_id, bm25({TABLE}) AS score '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s) {where} '
+            f'ORDER BY score{order}, rowid{order} LIMIT %s OFFSET %s'
+        )
+        params += [self.per_page + 1, offset]
+        with connection.cursor() as db:
+            db.execute(sql, params)
+            hits = [SearchHit(*row) for row in db.fetchall()]
+        return load_objects(hits)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """
+    Текст запроса без значений: литералы и списки IN сворачиваются,
+    поэтому запросы с разными id, страницами и числом авторов в IN
+    собираются в одну строку отчёта.
+    """
+    sql = LITERALS.sub('%s', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(params):
+    """Короткий хэш параметров: видно, один и тот же ли это запрос."""
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+
+def explain(connection, sql, params):
+    """Строки EXPLAIN QUERY PLAN для SELECT к SQLite, иначе пустой список."""
+    if connection.vendor != 'sqlite':
+        return []
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    # Курсор драйвера, а не Django: иначе план попал бы в execute_wrapper.
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+    except connection.Database.Error:
+        return []
+    finally:
+        cursor.close()
+
+
+def suspicious(line):
+    """Полный проход по таблице или сортировка во временном дереве."""
+    full_scan = line.startswith('SCAN ') and ' USING ' not in line
+    return full_scan or 'TEMP B-TREE' in line
+
+
+class SlowQueryLog:
+    """
+    Обёртка execute_wrapper: запросы дольше SLOW_QUERY_MS пишутся
+    строкой JSON в лог posts.slowqueries вместе с именем url и планом.
+    У SQLite часть работы приходится на чтение строк после execute,
+    поэтому время — нижняя оценка.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.threshold = settings.SLOW_QUERY_MS / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - started
+        if elapsed >= self.threshold:
+            self.log(context['connection'], sql, params, many, elapsed)
+        return result
+
+    def log(self, connection, sql, params, many, elapsed):
+        match = self.request.resolver_match
+        record = {
+            'view': match.view_name if match else None,
+            'alias': connection.alias,
+            'ms': round(elapsed * 1000, 2),
+            'sql': normalize(sql),
+            'params': fingerprint(params),
+            'plan': [] if many else explain(connection, sql, params),
+        }
+        logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+@contextmanager
+def logging_slow(request):
+    log = SlowQueryLog(request)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(log))
+        yield log
+
+
+def aggregate(lines):
+    """
+    Сводит строки лога по имени url и тексту запроса. Сначала идут
+    запросы, на которые ушло больше всего времени в сумме.
+    """
+    groups = defaultdict(list)
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        groups[record['view'], record['sql']].append(record)
+    report = []
+    for (view, sql), records in groups.items():
+        durations = [record['ms'] for record in records]
+        report.append(
+            {
+                'view': view,
+                'sql': sql,
+                'count': len(records),
+                'total_ms': round(sum(durations), 2),
+                'max_ms': max(durations),
+                'params': len({record['params'] for record in records}),
+                'plan': records[-1]['plan'],
+            }
+        )
+    return sorted(report, key=lambda entry: -entry['total_ms'])
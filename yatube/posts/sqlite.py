@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def configure(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через драйвер: настройка соединения — не запросы view,
+    # бюджеты, Server-Timing и метрики их считать не должны.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,210 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BUSY_TIMEOUT = 5
+# Время последнего чтения обновляется не чаще раза в секунду на ключ:
+# иначе каждое попадание было бы записью, а писатель в SQLite один.
+LRU_RESOLUTION = 1.0
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL,'
+    ' used REAL NOT NULL, size INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_used_idx ON cache (used)',
+    'CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS totals ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' entries INTEGER NOT NULL, bytes INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO totals VALUES (0, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN'
+    ' UPDATE totals SET entries = entries + 1, bytes = bytes + new.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size'
+    ' ON cache BEGIN'
+    ' UPDATE totals SET bytes = bytes - old.size + new.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN'
+    ' UPDATE totals SET entries = entries - 1, bytes = bytes - old.size;'
+    ' END',
+)
+UPSERT = (
+    'INSERT INTO cache (key, value, expires, used, size)'
+    ' VALUES (?, ?, ?, ?, ?)'
+    ' ON CONFLICT (key) DO UPDATE SET value = excluded.value,'
+    ' expires = excluded.expires, used = excluded.used,'
+    ' size = excluded.size'
+)
+
+
+def _expired(expires, now):
+    return expires is not None and expires <= now
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кэш в файле SQLite, общий для всех процессов на сервере: запись и
+    сброс версии ленты в одном воркере сразу видны остальным. Старые
+    записи вытесняются по давности чтения, когда записей больше
+    MAX_ENTRIES или значения занимают больше MAX_BYTES.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    def _connect(self):
+        directory = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(
+            self._path, timeout=BUSY_TIMEOUT, isolation_level=None
+        )
+        # Кэш можно потерять целиком, поэтому fsync не нужен.
+        db.execute('PRAGMA journal_mode = wal')
+        db.execute('PRAGMA synchronous = off')
+        for statement in SCHEMA:
+            db.execute(statement)
+        return db
+
+    def _db(self):
+        # Соединение открывается в каждом потоке и заново после fork:
+        # соединения SQLite нельзя передавать между процессами.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = self._connect()
+            local.pid = os.getpid()
+        return local.db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _row(self, key, value, timeout):
+        blob = pickle.dumps(value, self.pickle_protocol)
+        expires = self.get_backend_timeout(timeout)
+        return key, blob, expires, time.time(), len(blob)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        row = self._row(key, value, timeout)
+        with self._transaction() as db:
+            found = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if found is not None and not _expired(found[0], time.time()):
+                return False
+            db.execute(UPSERT, row)
+            self._cull(db)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        db = self._db()
+        found = db.execute(
+            'SELECT value, expires, used FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if found is None or _expired(found[1], now):
+            return default
+        if now - found[2] > LRU_RESOLUTION:
+            db.execute('UPDATE cache SET used = ? WHERE key = ?', (now, key))
+        return pickle.loads(found[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        row = self._row(key, value, timeout)
+        with self._transaction() as db:
+            db.execute(UPSERT, row)
+            self._cull(db)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._db().execute(
+            'UPDATE cache SET expires = ?'
+            ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._db().execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        found = self._db().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return found is not None and not _expired(found[0], time.time())
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись в одной транзакции."""
+        key = self._key(key, version)
+        with self._transaction() as db:
+            found = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if found is None or _expired(found[1], time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(found[0]) + delta
+            blob = pickle.dumps(value, self.pickle_protocol)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ?, used = ? WHERE key = ?',
+                (blob, len(blob), time.time(), key),
+            )
+        return value
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache')
+
+    def _overflow(self, db):
+        """Число записей, если кэш вышел за пределы, иначе 0."""
+        entries, size = db.execute(
+            'SELECT entries, bytes FROM totals'
+        ).fetchone()
+        if entries > self._max_entries or size > self._max_bytes:
+            return entries
+        return 0
+
+    def _cull(self, db):
+        if not self._overflow(db):
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        entries = self._overflow(db)
+        while entries:
+            # Как и LocMemCache, удаляем сразу 1/CULL_FREQUENCY записей,
+            # чтобы не вытеснять по одной на каждой следующей записи.
+            if self._cull_frequency:
+                count = max(entries // self._cull_frequency, 1)
+            else:
+                count = entries
+            db.execute(
+                'DELETE FROM cache WHERE key IN'
+                ' (SELECT key FROM cache ORDER BY used LIMIT ?)',
+                (count,),
+            )
+            entries = self._overflow(db)
@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedPost, Follow, Post, User, UserStats
+
+BATCH_SIZE = 1000
+
+
+def _count(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def with_counts(users):
+    return users.annotate(
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+        posts_count=_count(Post.objects.all(), 'author')
+        + _count(ArchivedPost.objects.all(), 'author'),
+    )
+
+
+def refresh(user_id):
+    user = with_counts(User.objects.filter(pk=user_id)).first()
+    if user is None:
+        return
+    UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'followers': user.followers_count,
+            'following': user.following_count,
+            'posts': user.posts_count,
+        },
+    )
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики пользователя; недостающая запись пересчитывается."""
+    with transaction.atomic():
+        updated = UserStats.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            refresh(user_id)
+
+
+def rebuild():
+    users = with_counts(User.objects.order_by('pk')).values_list(
+        'pk', 'followers_count', 'following_count', 'posts_count'
+    )
+    with transaction.atomic():
+        # Момент, с которого автор снова раскладывается по лентам, из
+        # таблиц не восстановить: он переживает пересчёт.
+        fanout_since = dict(
+            UserStats.objects.filter(fanout_since__isnull=False).values_list(
+                'user_id', 'fanout_since'
+            )
+        )
+        UserStats.objects.all().delete()
+        batch = []
+        for pk, followers, following, posts in users.iterator():
+            batch.append(
+                UserStats(
+                    user_id=pk,
+                    followers=followers,
+                    following=following,
+                    posts=posts,
+                    fanout_since=fanout_since.get(pk),
+                )
+            )
+            if len(batch) >= BATCH_SIZE:
+                UserStats.objects.bulk_create(batch)
+                batch = []
+        UserStats.objects.bulk_create(batch)
+    return UserStats.objects.count()
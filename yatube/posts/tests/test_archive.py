@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import exports, purge
+from posts.models import ArchivedPost, Comment, Post, User
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        now = timezone.now()
+        for number in range(15):
+            post = Post.objects.create(
+                text=f'запись {number}', author=self.author
+            )
+            # Пять записей старше года, остальные свежие.
+            age = timedelta(days=400 + number if number < 5 else number)
+            Post.objects.filter(pk=post.pk).update(pub_date=now - age)
+        self.old = Post.objects.order_by('pub_date').first()
+        self.comment = Comment.objects.create(
+            post=self.old, author=self.reader, text='старый комментарий'
+        )
+        call_command(
+            'archive_posts', days=365, batch_size=2, stdout=StringIO()
+        )
+
+    def test_archive_moves_old_posts(self):
+        """В архив уходят только старые записи, id и комментарии целы."""
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(ArchivedPost.objects.count(), 5)
+        archived = ArchivedPost.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.text, self.old.text)
+        self.assertEqual(list(archived.comments), [self.comment])
+
+    def test_feeds_continue_into_archive(self):
+        """Лента профиля после горячих записей продолжается архивом."""
+        url = reverse('posts:profile', args=[self.author.username])
+        first = self.client.get(url).context['page']
+        self.assertEqual(len(first), 10)
+        self.assertTrue(all(not post.is_archived for post in first))
+        second = self.client.get(url, {'after': first.next_cursor})
+        page = second.context['page']
+        self.assertEqual(len(page), 5)
+        self.assertTrue(all(post.is_archived for post in page))
+        self.assertIsNone(page.next_cursor)
+        back = self.client.get(url, {'before': page.previous_cursor})
+        self.assertEqual(list(back.context['page']), list(first))
+        by_number = self.client.get(url, {'page': 2}).context['page']
+        self.assertEqual(
+            [post.pk for post in by_number], [post.pk for post in page]
+        )
+
+    def test_old_hot_post_is_merged_with_archive(self):
+        """Старая запись в горячей таблице не прячет архив и стоит по дате."""
+        Post.objects.filter(pk=Post.objects.latest('pub_date').pk).delete()
+        imported = Post.objects.create(text='импорт', author=self.author)
+        Post.objects.filter(pk=imported.pk).update(
+            pub_date=timezone.now() - timedelta(days=3000)
+        )
+        expected = [
+            post.pk
+            for post in sorted(
+                [*Post.objects.all(), *ArchivedPost.objects.all()],
+                key=lambda post: (post.pub_date, post.pk),
+                reverse=True,
+            )
+        ]
+        self.assertEqual(expected[-1], imported.pk)
+        url = reverse('posts:profile', args=[self.author.username])
+        seen, params = [], {}
+        while True:
+            page = self.client.get(url, params).context['page']
+            seen += [post.pk for post in page]
+            if page.next_cursor is None:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+        by_number = [
+            post.pk
+            for number in (1, 2)
+            for post in self.client.get(url, {'page': number}).context['page']
+        ]
+        self.assertEqual(by_number, expected)
+
+    def test_archived_post_is_read_only(self):
+        """Архивная запись открывается, но без формы комментария."""
+        url = reverse('posts:post', args=[self.author.username, self.old.pk])
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context['post'].is_archived)
+        self.assertContains(resp, 'старый комментарий')
+        self.assertNotContains(resp, 'Добавить комментарий:')
+        resp = self.client.post(
+            reverse(
+                'posts:add_comment', args=[self.author.username, self.old.pk]
+            ),
+            {'text': 'новый'},
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_search_and_export_include_archive(self):
+        """Поиск и выгрузка видят архивные записи и их комментарии."""
+        resp = self.client.get(reverse('posts:search'), {'q': 'старый'})
+        self.assertEqual(
+            [(hit.kind, hit.object_id) for hit in resp.context['page']],
+            [('comment', self.comment.pk)],
+        )
+        self.assertContains(
+            resp,
+            reverse('posts:post', args=[self.author.username, self.old.pk]),
+        )
+        ids = [
+            row['id']
+            for row in exports.records(self.author)
+            if row['type'] == 'post'
+        ]
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(ids[0], self.old.pk)
+
+    def test_removed_account_purges_archive(self):
+        """Удаление аккаунта скрывает и затем удаляет его архив."""
+        purge.remove_user(self.author)
+        self.assertFalse(ArchivedPost.objects.exists())
+        purge.purge(batch_size=2)
+        self.assertFalse(ArchivedPost.all_objects.exists())
+        self.assertFalse(Comment.all_objects.exists())
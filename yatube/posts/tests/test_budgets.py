@@ -0,0 +1,234 @@
+import datetime
+import random
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts import archive, budgets, loadtest, thumbnails, urls
+from posts.models import Follow, Group, Post, User, UserStats
+from posts.views import POSTS_PER_PAGE
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xff\xff\xff\x21\xf9\x04\x00\x00\x00\x00\x00\x2c\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0c\x0a\x00\x3b'
+)
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name='small.gif'):
+    return SimpleUploadedFile(name, SMALL_GIF, 'image/gif')
+
+
+class BudgetAssertions:
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def assertWithinBudget(self, name, request):
+        cache.clear()
+        with budgets.counting() as counter:
+            response = request()
+        self.assertLess(response.status_code, 400, name)
+        self.assertIsNotNone(budgets.limit(name), name)
+        self.assertLessEqual(
+            counter.count,
+            budgets.limit(name),
+            budgets.describe(name, counter),
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(BudgetAssertions, TestCase):
+    """
+    Каждое view укладывается в QUERY_BUDGETS на данных в несколько
+    страниц с холодным кэшем: лишний запрос в шаблоне ленты или N+1
+    в цикле ломает этот тест.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        volumes = {
+            'users': 20,
+            'groups': 3,
+            'posts': 300,
+            'comments': 600,
+            'follows': 100,
+        }
+        loadtest.seed(volumes, random.Random(0))
+
+    def setUp(self):
+        self.session = loadtest.Session(
+            loadtest.Dataset(), random.Random(0)
+        )
+
+    def test_every_view_has_budget(self):
+        """Бюджеты и сценарии есть у всех адресов posts/urls.py."""
+        names = {f'posts:{pattern.name}' for pattern in urls.urlpatterns}
+        names.add('group')
+        self.assertEqual(set(loadtest.SCENARIOS), names)
+        self.assertEqual(set(settings.QUERY_BUDGETS), names)
+
+    def test_views_within_budget(self):
+        """Каждое view на первой странице не выходит за бюджет."""
+        for name, (method, args, params) in loadtest.SCENARIOS.items():
+            with self.subTest(name=name):
+                url = reverse(name, args=args(self.session))
+                data = params(self.session)
+                client = getattr(self.session.client, method)
+                self.assertWithinBudget(name, lambda: client(url, data))
+
+    def test_feed_pages_within_budget(self):
+        """Дальние страницы лент стоят столько же запросов, сколько первая."""
+        author = User.objects.order_by('pk').first().username
+        group = self.session.group()
+        pages = {
+            'posts:index': reverse('posts:index'),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:profile': reverse('posts:profile', args=[author]),
+            'group': reverse('group', args=[group]),
+        }
+        for name, url in pages.items():
+            with self.subTest(name=name):
+                self.assertWithinBudget(
+                    name,
+                    lambda: self.session.client.get(url, {'page': 3}),
+                )
+
+    def test_tier_boundary_within_budget(self):
+        """Страница на стыке горячей таблицы и архива не выходит за бюджет."""
+        archive.archive(datetime.timedelta(days=365), batch_size=100)
+        author = User.objects.order_by('pk').first()
+        group = self.session.group()
+        pages = {
+            'posts:index': (reverse('posts:index'), Post.objects),
+            'posts:profile': (
+                reverse('posts:profile', args=[author.username]),
+                author.posts,
+            ),
+            'group': (
+                reverse('group', args=[group]),
+                Post.objects.filter(group__slug=group),
+            ),
+        }
+        for name, (url, hot) in pages.items():
+            page = hot.count() // POSTS_PER_PAGE + 1
+            with self.subTest(name=name, page=page):
+                self.assertWithinBudget(
+                    name,
+                    lambda: self.session.client.get(url, {'page': page}),
+                )
+
+    def test_image_and_heavy_author_pages_within_budget(self):
+        """
+        Карточки с картинками без вариантов и лента с популярным автором,
+        чьи записи подмешиваются при чтении.
+        """
+        author = User.objects.exclude(pk=self.session.user_id).first()
+        group = Group.objects.first()
+        Follow.objects.get_or_create(
+            user_id=self.session.user_id, author=author
+        )
+        UserStats.objects.filter(user=author).update(
+            followers=settings.TIMELINE_FANOUT_LIMIT + 1
+        )
+        posts = [
+            Post.objects.create(
+                text=f'картинка {number}',
+                author=author,
+                group=group,
+                image=upload(),
+            )
+            for number in range(POSTS_PER_PAGE)
+        ]
+        # У части старых записей миниатюру уже нарезал прежний шаблон.
+        geometry, options = thumbnails.CARD_GEOMETRY
+        for post in posts[::2]:
+            get_thumbnail(post.image, geometry, **options)
+        pages = {
+            'posts:index': (reverse('posts:index'), {}),
+            'posts:follow_index': (reverse('posts:follow_index'), {}),
+            'posts:profile': (
+                reverse('posts:profile', args=[author.username]),
+                {},
+            ),
+            'group': (reverse('group', args=[group.slug]), {}),
+            'posts:search': (reverse('posts:search'), {'q': 'картинка'}),
+            'posts:post': (
+                reverse('posts:post', args=[author.username, posts[0].pk]),
+                {},
+            ),
+        }
+        for name, (url, data) in pages.items():
+            with self.subTest(name=name):
+                self.assertWithinBudget(
+                    name, lambda: self.session.client.get(url, data)
+                )
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 0})
+    def test_middleware_logs_overrun(self):
+        """Превышение бюджета попадает в лог вместе с текстом запросов."""
+        with self.assertLogs('posts.budgets', 'WARNING') as logs:
+            Client().get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class WriteBudgetTests(BudgetAssertions, TransactionTestCase):
+    """
+    Запросы, которые пишут: on_commit здесь срабатывает, поэтому в счёт
+    входят раскладка по лентам и нарезка вариантов картинки.
+    """
+
+    def test_new_connection_within_budget(self):
+        """PRAGMA нового соединения не тратят бюджет первого запроса."""
+
+        def request():
+            # Так Django настраивает каждое новое соединение.
+            connection_created.send(
+                sender=connection.__class__, connection=connection
+            )
+            return Client().get(reverse('posts:index'))
+
+        self.assertWithinBudget('posts:index', request)
+
+    def test_posts_with_group_and_image_within_budget(self):
+        """Новая запись и правка с группой и картинкой."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(text='первая', author=author)
+        client = Client()
+        client.force_login(author)
+        requests = {
+            'posts:new_post': (
+                reverse('posts:new_post'),
+                {'text': 'новая', 'group': group.pk, 'image': upload()},
+            ),
+            'posts:post_edit': (
+                reverse('posts:post_edit', args=['author', post.pk]),
+                {'text': 'правка', 'group': group.pk, 'image': upload()},
+            ),
+        }
+        for name, (url, data) in requests.items():
+            with self.subTest(name=name):
+                self.assertWithinBudget(name, lambda: client.post(url, data))
+        self.assertEqual(
+            Post.objects.exclude(image_variants='').count(), 2
+        )
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search
+from posts.models import Follow, Group, Post, Timeline, User, UserStats
+
+
+class ImportPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        stderr = StringIO()
+        call_command(
+            'import_posts', path, stdout=StringIO(), stderr=stderr, **options
+        )
+        return stderr.getvalue()
+
+    def test_import_keeps_counters_consistent(self):
+        """Импорт обновляет счётчики, ленты подписок и поиск."""
+        rows = [
+            {
+                'author': 'author',
+                'text': 'Импортированный кит',
+                'group': 'group',
+                'pub_date': '2020-01-02T10:00:00',
+            },
+            {'author': 'author', 'text': 'Вторая запись'},
+            {'author': 'nobody', 'text': 'Без автора'},
+        ]
+        path = self.write(
+            'posts.ndjson', '\n'.join(json.dumps(row) for row in rows)
+        )
+        errors = self.run_import(path, batch_size=1)
+        self.assertIn('Строка 3', errors)
+        post = Post.objects.get(text='Импортированный кит')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(UserStats.objects.get(user=self.author).posts, 2)
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 2)
+        if search.available():
+            found = search.filter_queryset(Post.objects.all(), 'post', 'кит')
+            self.assertEqual(list(found), [post])
+
+    def test_bad_dates_reject_only_their_rows(self):
+        """Строки с неверной датой пропускаются, остальные импортируются."""
+        dates = ['2021-13-45T00:00', None, 'вчера', 20210101]
+        rows = [
+            {'author': 'author', 'text': f'дата {date}', 'pub_date': date}
+            for date in dates
+        ]
+        rows.append(
+            {
+                'author': 'author',
+                'text': 'верная',
+                'pub_date': '2021-01-01T09:30',
+            }
+        )
+        path = self.write(
+            'posts.ndjson', '\n'.join(json.dumps(row) for row in rows)
+        )
+        errors = self.run_import(path)
+        for number in range(1, 5):
+            self.assertIn(f'Строка {number}: неверная дата', errors)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['верная']
+        )
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск продолжает импорт с сохранённой строки."""
+        path = self.write(
+            'posts.csv',
+            'author,text\nauthor,первая\nauthor,вторая\nauthor,третья\n',
+        )
+        self.write('posts.csv.checkpoint', json.dumps({'rows': 1}))
+        self.run_import(path, transaction_size=1)
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'вторая', 'третья'},
+        )
+        self.run_import(path)
+        self.assertEqual(Post.objects.count(), 2)
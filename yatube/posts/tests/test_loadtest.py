@@ -0,0 +1,41 @@
+import random
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import loadtest
+from posts.models import Comment, Follow, Post, UserStats
+
+
+class LoadTestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        volumes = {
+            'users': 30,
+            'groups': 3,
+            'posts': 200,
+            'comments': 300,
+            'follows': 100,
+        }
+        loadtest.seed(volumes, random.Random(0))
+
+    def test_seed_is_consistent(self):
+        """Счётчики совпадают с данными, популярность неравномерна."""
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Follow.objects.count(), 100)
+        post = Post.objects.order_by('-pub_date').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts', flat=True)), 200
+        )
+        top = Comment.objects.filter(post=post).count()
+        self.assertGreater(top, 300 / 200)
+
+    def test_run_covers_every_view(self):
+        """Прогон обходит все view без ошибок и считает запросы."""
+        result = loadtest.run(loadtest.SCENARIOS, per_view=2, concurrency=1)
+        self.assertEqual(set(result['views']), set(loadtest.SCENARIOS))
+        self.assertEqual(result['total']['requests'], 2 * len(result['views']))
+        self.assertEqual(result['total']['errors'], 0)
+        for row in result['views'].values():
+            self.assertGreater(row['max_queries'], 0)
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import metrics
+from posts.models import Post, User
+
+METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(METRICS_DIR=METRICS_DIR, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics._values.clear()
+        for name in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, name))
+        self.author = User.objects.create_user(username='author')
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def scrape(self):
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, 200)
+        return dict(
+            line.rsplit(' ', 1)
+            for line in resp.content.decode().splitlines()
+            if not line.startswith('#')
+        )
+
+    def test_access(self):
+        """Страница метрик скрыта от посетителей, но доступна по токену."""
+        self.assertEqual(Client().get(reverse('metrics')).status_code, 404)
+        resp = Client().get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(
+            resp, '# TYPE yatube_request_duration_seconds histogram'
+        )
+
+    def test_request_and_model_metrics(self):
+        """Гистограммы по имени url, кэш фрагментов и счётчики создания."""
+        Post.objects.create(text='текст', author=self.author)
+        url = reverse('posts:profile', args=[self.author.username])
+        self.client.get(url)
+        self.client.get(url)
+        values = self.scrape()
+        view = 'view="posts:profile"'
+        latency = 'yatube_request_duration_seconds'
+        self.assertEqual(values[f'{latency}_count{{{view}}}'], '2')
+        self.assertEqual(values[f'{latency}_bucket{{{view},le="+Inf"}}'], '2')
+        self.assertIn(f'yatube_db_queries_sum{{{view}}}', values)
+        self.assertEqual(values['yatube_posts_created_total'], '1')
+        self.assertEqual(values['yatube_fragment_cache_hit_ratio'], '0.5')
+
+    def test_processes_are_summed(self):
+        """Значения других процессов, в том числе с тем же pid, суммируются."""
+        Post.objects.create(text='текст', author=self.author)
+        for name in ('worker-1-other.json', f'worker-{os.getpid()}-old.json'):
+            with open(os.path.join(METRICS_DIR, name), 'w') as file:
+                json.dump({'yatube_posts_created_total': 2}, file)
+        self.assertEqual(self.scrape()['yatube_posts_created_total'], '5')
+
+    def test_dead_workers_are_archived(self):
+        """Файл завершившегося процесса переносится в архив без потерь."""
+        child = subprocess.Popen([sys.executable, '-c', 'pass'])
+        child.wait()
+        name = f'worker-{child.pid}-dead.json'
+        with open(os.path.join(METRICS_DIR, name), 'w') as file:
+            json.dump({'yatube_posts_created_total': 4}, file)
+        Post.objects.create(text='текст', author=self.author)
+        self.assertEqual(self.scrape()['yatube_posts_created_total'], '5')
+        self.assertNotIn(name, os.listdir(METRICS_DIR))
+        self.assertIn(metrics.ARCHIVE, os.listdir(METRICS_DIR))
+        self.assertEqual(self.scrape()['yatube_posts_created_total'], '5')
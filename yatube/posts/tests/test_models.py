@@ -1,6 +1,11 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-from posts.models import Group, Post, User
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from posts import purge
+from posts.models import Follow, Group, Post, User, UserStats
 
 
 class GroupModelTest(TestCase):
@@ -32,3 +37,68 @@ class PostModelTest(TestCase):
         post = PostModelTest.post
         text = post.text[:15]
         self.assertEqual(text, str(post), 'Ошиибка в test_text')
+
+
+class UserStatsModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+
+    def assertStats(self, user, followers, following, posts):
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.followers, stats.following, stats.posts),
+            (followers, following, posts),
+        )
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с подписками и записями."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='текст', author=self.author)
+        self.assertStats(self.author, 1, 0, 1)
+        self.assertStats(self.user, 0, 1, 0)
+        follow.delete()
+        post.delete()
+        self.assertStats(self.author, 0, 0, 0)
+        self.assertStats(self.user, 0, 0, 0)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_user_stats восстанавливает счётчики."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='текст', author=self.author)
+        purge.delete_post(
+            Post.objects.create(text='удалённая', author=self.author)
+        )
+        UserStats.objects.update(followers=42, following=42, posts=42)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertStats(self.author, 1, 0, 1)
+        self.assertStats(self.user, 0, 1, 0)
+
+
+class UserStatsAtomicityTest(TransactionTestCase):
+    """Запись и сдвиг её счётчиков фиксируются в одной транзакции."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user')
+        self.author = User.objects.create_user(username='author')
+
+    def test_failed_bump_rolls_back_write(self):
+        """Если счётчик не сдвинулся, запись и подписка не сохраняются."""
+        with mock.patch('posts.stats.bump', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Post.objects.create(text='текст', author=self.author)
+            with self.assertRaises(RuntimeError):
+                Follow.objects.create(user=self.user, author=self.author)
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Follow.objects.exists())
+
+    def test_failed_bump_keeps_follow_on_delete(self):
+        """Неудачный сдвиг при отписке не удаляет подписку."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        with mock.patch('posts.stats.bump', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                follow.delete()
+        self.assertTrue(Follow.objects.filter(pk=follow.pk).exists())
+        self.assertEqual(UserStats.objects.get(user=self.author).followers, 1)
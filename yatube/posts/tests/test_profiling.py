@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import profiling
+from posts.models import Post, User
+
+PROFILE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def busy(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+@override_settings(
+    PROFILE_DIR=PROFILE_DIR, PROFILE_INTERVAL=0.001, QUERY_BUDGETS={}
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        for name in os.listdir(PROFILE_DIR):
+            os.remove(os.path.join(PROFILE_DIR, name))
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(text='текст', author=self.author)
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.url = reverse('posts:index')
+
+    def read(self, name):
+        with open(os.path.join(PROFILE_DIR, name)) as file:
+            return file.read()
+
+    def test_sampler_collapses_stacks(self):
+        """Стеки пишутся строками «кадр;кадр;... число»."""
+        sampler = profiling.Sampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy(0.05)
+        name = profiling.save(sampler.stop(), 'posts:index')
+        lines = self.read(name).splitlines()
+        self.assertTrue(lines)
+        stack, samples = lines[0].rsplit(' ', 1)
+        self.assertIn('busy (tests/test_profiling.py:', stack.split(';')[-1])
+        self.assertGreater(int(samples), 0)
+
+    def test_staff_switch(self):
+        """Профиль снимается только для сотрудника с ?profile=1."""
+        client = Client()
+        client.force_login(self.author)
+        resp = client.get(self.url, {'profile': '1'})
+        self.assertNotIn('X-Profile', resp)
+        client.force_login(self.staff)
+        resp = client.get(self.url, {'profile': '1'})
+        self.assertTrue(resp['X-Profile'].endswith('.folded'))
+        self.assertEqual(os.listdir(PROFILE_DIR), [resp['X-Profile']])
+
+    def test_signed_header(self):
+        """Подписанный заголовок включает профиль, поддельный — нет."""
+        resp = Client().get(self.url, HTTP_X_PROFILE='profile')
+        self.assertNotIn('X-Profile', resp)
+        resp = Client().get(self.url, HTTP_X_PROFILE=profiling.make_token())
+        self.assertIn('X-Profile', resp)
+
+    @override_settings(PROFILE_SAMPLE_EVERY={'posts:index': 2})
+    def test_sampling_every_nth_request(self):
+        """В режиме выборки профилируется каждый N-й запрос к view."""
+        for _ in range(4):
+            resp = Client().get(self.url)
+            self.assertNotIn('X-Profile', resp)
+        Client().get(reverse('posts:search'))
+        files = os.listdir(PROFILE_DIR)
+        self.assertEqual(len(files), 2)
+        self.assertTrue(all('posts-index' in name for name in files))
@@ -0,0 +1,133 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import archive, purge, thumbnails
+from posts.models import (
+    ArchivedPost,
+    Comment,
+    Follow,
+    Post,
+    Timeline,
+    User,
+    UserStats,
+)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xff\xff\xff\x21\xf9\x04\x00\x00\x00\x00\x00\x2c\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0c\x0a\x00\x3b'
+)
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PurgeTests(TransactionTestCase):
+    """Файлы удаляются в on_commit, поэтому нужны настоящие коммиты."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def run_purge(self):
+        call_command('purge_deleted', batch_size=1, pause=0, stdout=StringIO())
+
+    def test_post_delete_hides_then_purges(self):
+        """Удалённая запись скрыта сразу, а строки и файлы — после purge."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(
+            text='текст',
+            author=self.author,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        thumbnails.generate(post.pk)
+        post.refresh_from_db()
+        Comment.objects.create(post=post, author=self.reader, text='раз')
+        storage = post.image.storage
+        self.client.get(
+            reverse('posts:post_delete', args=[self.author.username, post.pk])
+        )
+        self.assertFalse(Post.objects.exists())
+        reader = Client()
+        reader.force_login(self.reader)
+        resp = reader.get(reverse('posts:follow_index'))
+        self.assertEqual(list(resp.context['page']), [])
+        self.assertEqual(UserStats.objects.get(user=self.author).posts, 0)
+        resp = self.client.get(
+            reverse('posts:post', args=[self.author.username, post.pk])
+        )
+        self.assertEqual(resp.status_code, 404)
+        self.assertTrue(storage.exists(post.image.name))
+
+        self.run_purge()
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Comment.all_objects.exists())
+        self.assertFalse(Timeline.objects.exists())
+        self.assertFalse(storage.exists(post.image.name))
+
+    def test_remove_user(self):
+        """Аккаунт скрывается сразу и удаляется пачками вместе с данными."""
+        own = Post.objects.create(text='свой', author=self.author)
+        other = Post.objects.create(text='чужой', author=self.reader)
+        Comment.objects.create(post=other, author=self.author, text='раз')
+        Comment.objects.create(post=other, author=self.reader, text='два')
+        Comment.objects.create(post=own, author=self.reader, text='три')
+        Follow.objects.create(user=self.reader, author=self.author)
+        purge.remove_user(self.author)
+
+        other.refresh_from_db()
+        self.assertEqual(other.comments_count, 1)
+        self.assertEqual(list(Post.objects.all()), [other])
+        self.assertEqual(other.comments.count(), 1)
+        resp = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertNotEqual(resp.status_code, 200)
+
+        self.run_purge()
+        self.assertFalse(User.objects.filter(username='author').exists())
+        self.assertEqual(list(Post.all_objects.all()), [other])
+        self.assertEqual(Comment.all_objects.count(), 1)
+        self.assertEqual(UserStats.objects.get(user=self.reader).following, 0)
+
+    def test_purge_leaves_no_orphan_comments(self):
+        """Комментарии записей, удалённых в обход каскада, тоже удаляются."""
+        kept, raw, dropped = (
+            Post.objects.create(text=text, author=self.author)
+            for text in ('архив', 'сырое', 'удалённое')
+        )
+        for post in (kept, raw, dropped):
+            Comment.objects.create(post=post, author=self.reader, text='к')
+        Post.objects.filter(pk__in=[kept.pk, dropped.pk]).update(
+            pub_date=timezone.now() - timedelta(days=400)
+        )
+        archive.archive(timedelta(days=365), batch_size=10)
+        rows = Post.all_objects.filter(pk=raw.pk)
+        rows._raw_delete(rows.db)
+        ArchivedPost.objects.filter(pk=dropped.pk).delete()
+        self.assertEqual(Comment.all_objects.count(), 3)
+
+        self.run_purge()
+        self.assertEqual(
+            list(Comment.all_objects.values_list('post_id', flat=True)),
+            [kept.pk],
+        )
+        archived = ArchivedPost.objects.get(pk=kept.pk)
+        self.assertEqual(archived.comments.count(), 1)
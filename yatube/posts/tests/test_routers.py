@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import tempfile
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import cache_versions
+from posts.models import Post, User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TransactionTestCase):
+    """Реплика — отдельный файл SQLite, снятый копией основной базы."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.old = Post.objects.create(text='старая', author=self.author)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        self.path = os.path.join(directory, 'replica.sqlite3')
+        self.addCleanup(os.remove, self.path)
+        self.sync_replica()
+        connections.databases['replica'] = {
+            **connections.databases['default'],
+            'NAME': self.path,
+        }
+        self.addCleanup(self.drop_replica)
+
+    def sync_replica(self):
+        connections['default'].ensure_connection()
+        with sqlite3.connect(self.path) as replica:
+            connections['default'].connection.backup(replica)
+
+    def drop_replica(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+
+    def index_texts(self, client):
+        resp = client.get(reverse('posts:index'))
+        return [post.text for post in resp.context['page']]
+
+    def test_feeds_read_from_replica(self):
+        """Ленты читаются с реплики, которая отстаёт от основной базы."""
+        Post.objects.create(text='новая', author=self.author)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.assertEqual(self.index_texts(Client()), ['старая'])
+        self.assertTrue(queries.captured_queries)
+
+    def test_lagging_replica_is_not_cached(self):
+        """Отставшая от новой версии страница не кэшируется и без ETag."""
+        url = reverse('posts:profile', args=['author'])
+        Client().get(url)
+        Post.objects.create(text='новая', author=self.author)
+        resp = Client().get(url)
+        self.assertNotContains(resp, 'новая')
+        self.assertFalse(resp.has_header('ETag'))
+        self.sync_replica()
+        self.assertContains(Client().get(url), 'новая')
+        cache.delete(cache_versions.BUMPED.format(f'author:{self.author.pk}'))
+        resp = Client().get(url)
+        self.assertContains(resp, 'новая')
+        self.assertTrue(resp.has_header('ETag'))
+
+    def test_read_your_writes_after_post(self):
+        """После своего POST клиент видит изменения в основной базе."""
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:new_post'), {'text': 'своя'})
+        self.assertEqual(self.index_texts(client), ['своя', 'старая'])
+        self.assertEqual(self.index_texts(Client()), ['старая'])
+
+    def test_read_your_writes_after_get_link(self):
+        """Удаление записи по ссылке GET тоже переводит чтение на основную."""
+        client = Client()
+        client.force_login(self.author)
+        resp = client.get(
+            reverse('posts:post_delete', args=['author', self.old.pk])
+        )
+        self.assertIn('pin_primary', resp.cookies)
+        self.assertEqual(self.index_texts(client), [])
+        self.assertEqual(self.index_texts(Client()), ['старая'])
+        resp = Client().get(reverse('posts:index'))
+        self.assertNotIn('pin_primary', resp.cookies)
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import purge
+from posts.models import Comment, Group, Post, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(title='Кошки и собаки', slug='pets')
+        cls.post = Post.objects.create(
+            text='Пишу про котиков', author=cls.user, group=cls.group
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Собаки лучше'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        resp = self.client.get(reverse('posts:search'), {'q': query, **params})
+        return resp.context['page']
+
+    def found(self, query):
+        return {(hit.kind, hit.object_id) for hit in self.search(query)}
+
+    def test_search_covers_posts_comments_groups(self):
+        """Поиск находит записи, комментарии и группы по префиксу слова."""
+        self.assertEqual(self.found('котик'), {('post', self.post.pk)})
+        self.assertEqual(
+            self.found('собаки'),
+            {('comment', self.comment.pk), ('group', self.group.pk)},
+        )
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при правке и удалении."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Теперь про попугаев'
+        post.save()
+        self.assertEqual(self.found('котик'), set())
+        self.assertEqual(self.found('попугаев'), {('post', self.post.pk)})
+        post.delete()
+        self.assertEqual(self.found('попугаев'), set())
+        self.assertEqual(self.found('собаки'), {('group', self.group.pk)})
+
+    def test_cursor_pagination(self):
+        for i in range(12):
+            Post.objects.create(text=f'рыбки {i}', author=self.user)
+        first = self.search('рыбки')
+        self.assertEqual(len(first), 10)
+        second = self.search('рыбки', after=first.next_cursor)
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(second.next_cursor)
+        back = self.search('рыбки', before=second.previous_cursor)
+        self.assertEqual(
+            [hit.rowid for hit in back], [hit.rowid for hit in first]
+        )
+
+    def test_soft_deleted_hits_do_not_break_pages(self):
+        """Скрытые записи и их комментарии не занимают место на странице."""
+        posts = [
+            Post.objects.create(text=f'рыбки {i}', author=self.user)
+            for i in range(15)
+        ]
+        Comment.objects.create(
+            post=posts[0], author=self.user, text='тоже рыбки'
+        )
+        for post in posts[:3]:
+            purge.delete_post(post)
+        for rebuilt in (False, True):
+            if rebuilt:
+                call_command('rebuild_search_index', stdout=StringIO())
+            with self.subTest(rebuilt=rebuilt):
+                first = self.search('рыбки')
+                self.assertEqual(len(first), 10)
+                second = self.search('рыбки', after=first.next_cursor)
+                self.assertIsNone(second.next_cursor)
+                self.assertEqual(
+                    {hit.object for hit in [*first, *second]},
+                    set(posts[3:]),
+                )
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search')
+        self.assertEqual(self.found('котик'), set())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('котик'), {('post', self.post.pk)})
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        Post.objects.create(text='Совсем другое', author=self.user)
+        resp = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(
+            list(resp.context['cl'].result_list), [self.post]
+        )
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import slowqueries
+from posts.models import Follow, Post, User
+
+
+@override_settings(SLOW_QUERY_MS=0, QUERY_BUDGETS={})
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='текст', author=self.author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def records(self, url):
+        with self.assertLogs('posts.slowqueries', 'WARNING') as logs:
+            self.client.get(url)
+        return [json.loads(line.split(':', 2)[2]) for line in logs.output]
+
+    def test_normalize(self):
+        """Значения и длина списка IN не различают запросы."""
+        self.assertEqual(
+            slowqueries.normalize(
+                "SELECT  *\n FROM t WHERE a IN (%s, %s) AND b = 'x' LIMIT 11"
+            ),
+            'SELECT * FROM t WHERE a IN (...) AND b = %s LIMIT %s',
+        )
+
+    def test_follow_index_and_profile_plans(self):
+        """В логе имя url, текст без значений, хэш параметров и план."""
+        for name, args in (
+            ('posts:follow_index', []),
+            ('posts:profile', [self.author.username]),
+        ):
+            with self.subTest(name=name):
+                records = self.records(reverse(name, args=args))
+                self.assertTrue(all(r['view'] == name for r in records))
+                feed = next(r for r in records if 'ORDER BY' in r['sql'])
+                self.assertTrue(feed['sql'].endswith('LIMIT %s'))
+                self.assertEqual(len(feed['params']), 12)
+                self.assertTrue(feed['plan'])
+
+    @override_settings(SLOW_QUERY_MS=1000)
+    def test_fast_queries_are_not_logged(self):
+        """Запросы быстрее порога в лог не попадают."""
+        with self.assertRaises(AssertionError):
+            self.records(reverse('posts:follow_index'))
+
+    def test_report_aggregates_repeats(self):
+        """Отчёт сводит повторы одного запроса и отмечает полный проход."""
+        url = reverse('posts:profile', args=[self.author.username])
+        lines = [json.dumps(record) for record in self.records(url) * 3]
+        lines.append(
+            json.dumps(
+                {
+                    'view': 'posts:search',
+                    'sql': 'SELECT * FROM posts_post',
+                    'ms': 5,
+                    'params': '0',
+                    'plan': ['SCAN posts_post'],
+                }
+            )
+        )
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, 'w') as file:
+            file.write('\n'.join(lines))
+        out = StringIO()
+        try:
+            call_command('slowqueries', log=path, min_count=1, stdout=out)
+        finally:
+            os.remove(path)
+        output = out.getvalue()
+        self.assertIn('posts:profile: 3 раз', output)
+        self.assertIn('SCAN posts_post  <- проверьте индекс', output)
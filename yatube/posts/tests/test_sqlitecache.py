@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from posts import cache_versions, sqlitecache
+from posts.backends import SQLiteCache
+
+CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def bump_in_child(path):
+    cache = SQLiteCache(path, {})
+    cache.incr('counter')
+    cache.set('from_child', 'значение')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.path = os.path.join(CACHE_DIR, f'{self._testMethodName}.db')
+        self.cache = self.make()
+
+    def make(self, **options):
+        options.setdefault('CULL_FREQUENCY', 2)
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """Операции кэша Django, в том числе сроки жизни и incr."""
+        cache = self.cache
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', {'a': 1})
+        self.assertEqual(cache.get('key'), {'a': 1})
+        self.assertFalse(cache.add('key', 'другое'))
+        self.assertTrue(cache.add('new', 1, None))
+        self.assertEqual(cache.incr('new', 5), 6)
+        self.assertEqual(cache.decr('new'), 5)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        self.assertEqual(
+            cache.get_many(['key', 'new', 'missing']),
+            {'key': {'a': 1}, 'new': 5},
+        )
+        cache.set('expired', 1, 0)
+        self.assertFalse(cache.has_key('expired'))
+        self.assertTrue(cache.add('expired', 2))
+        self.assertFalse(cache.touch('missing'))
+        self.assertTrue(cache.touch('key', None))
+        self.assertTrue(cache.delete('key'))
+        self.assertFalse(cache.has_key('key'))
+        cache.clear()
+        self.assertIsNone(cache.get('new'))
+
+    def test_shared_between_instances_and_processes(self):
+        """Запись и incr одного воркера сразу видны остальным."""
+        other = self.make()
+        self.cache.set('counter', 1)
+        self.assertEqual(other.incr('counter'), 2)
+        self.cache.get('counter')
+        child = multiprocessing.get_context('fork').Process(
+            target=bump_in_child, args=(self.path,)
+        )
+        child.start()
+        child.join()
+        self.assertEqual(child.exitcode, 0)
+        self.assertEqual(self.cache.get('counter'), 3)
+        self.assertEqual(other.get('from_child'), 'значение')
+
+    def test_version_bump_reaches_other_workers(self):
+        """Сброс версии ленты в одном процессе меняет ключ фрагментов."""
+        other = self.make()
+        with mock.patch.object(cache_versions, 'cache', self.cache):
+            before = cache_versions.version('index')
+        with mock.patch.object(cache_versions, 'cache', other):
+            cache_versions.bump('index')
+        with mock.patch.object(cache_versions, 'cache', self.cache):
+            self.assertNotEqual(cache_versions.version('index'), before)
+
+    @mock.patch.object(sqlitecache, 'LRU_RESOLUTION', -1)
+    def test_evicts_least_recently_used(self):
+        """При переполнении уходят давно не читанные записи."""
+        cache = self.make(MAX_ENTRIES=4)
+        for number in range(4):
+            cache.set(number, number)
+        cache.get(0)
+        cache.get(1)
+        cache.set(4, 4)
+        self.assertEqual(
+            [number for number in range(5) if cache.has_key(number)],
+            [0, 1, 4],
+        )
+
+    def test_size_limit(self):
+        """Значения в сумме не занимают больше MAX_BYTES."""
+        cache = self.make(MAX_BYTES=10000)
+        for number in range(20):
+            cache.set(number, 'x' * 1000)
+        entries, size = cache._db().execute(
+            'SELECT entries, bytes FROM totals'
+        ).fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertEqual(
+            entries, sum(cache.has_key(number) for number in range(20))
+        )
+        self.assertTrue(cache.has_key(19))
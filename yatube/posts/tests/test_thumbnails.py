@@ -0,0 +1,134 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(width=1000, height=500, name='photo.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_INGEST_WORKERS=0)
+class ThumbnailTests(TransactionTestCase):
+    """Варианты готовятся в on_commit, поэтому нужны настоящие коммиты."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+
+    def create(self, **kwargs):
+        kwargs.setdefault('image', upload())
+        return Post.objects.create(text='текст', author=self.author, **kwargs)
+
+    def variant_files(self, post):
+        directory = f'{thumbnails.VARIANTS_DIR}/{post.pk}'
+        return sorted(post.image.storage.listdir(directory)[1])
+
+    def test_generate_fills_variants_and_placeholder(self):
+        """Варианты по ширинам не шире оригинала, в WebP и исходном формате."""
+        post = self.create()
+        thumbnails.generate(post.pk)
+        post.refresh_from_db()
+        variants = json.loads(post.image_variants)
+        self.assertEqual(
+            {(v['width'], v['type']) for v in variants},
+            {
+                (width, kind)
+                for width in (480, 960)
+                for kind in ('image/webp', 'image/png')
+            },
+        )
+        storage = post.image.storage
+        for variant in variants:
+            with storage.open(variant['name']) as file:
+                image = Image.open(file)
+                self.assertEqual(
+                    image.size,
+                    (variant['width'], round(variant['width'] * 339 / 960)),
+                )
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        sources = post.image_sources
+        self.assertIn(' 960w', sources['webp'])
+        self.assertTrue(sources['src'].endswith('-960.png'))
+
+    def test_queue_runs_after_commit(self):
+        """Без пула варианты готовятся сразу после коммита записи."""
+        with transaction.atomic():
+            post = self.create()
+            thumbnails.queue(post)
+            post.refresh_from_db()
+            self.assertEqual(post.image_variants, '')
+        post.refresh_from_db()
+        self.assertTrue(json.loads(post.image_variants))
+
+    def test_queue_skips_posts_without_image(self):
+        """Запись без картинки в очередь не ставится."""
+        post = self.create(image=None)
+        thumbnails.queue(post)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+
+    @override_settings(THUMBNAIL_INGEST_WORKERS=2)
+    def test_queue_uses_worker_pool(self):
+        """С THUMBNAIL_INGEST_WORKERS варианты готовит пул потоков."""
+        self.addCleanup(setattr, thumbnails, '_executor', None)
+        thumbnails._executor = None
+        posts = [self.create(image=upload(name=f'{n}.png')) for n in range(3)]
+        for post in posts:
+            thumbnails.queue(post)
+        thumbnails._executor.shutdown(wait=True)
+        for post in posts:
+            post.refresh_from_db()
+            self.assertTrue(json.loads(post.image_variants))
+
+    def test_backfill_command_is_idempotent(self):
+        """Команда заполняет варианты, повторный запуск ничего не плодит."""
+        posts = [self.create(image=upload(name=f'{n}.png')) for n in range(2)]
+        broken = self.create(
+            image=SimpleUploadedFile('broken.png', b'not an image')
+        )
+        self.create(image=None)
+        out, err = StringIO(), StringIO()
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            call_command(
+                'generate_thumbnails', workers=0, stdout=out, stderr=err
+            )
+        self.assertIn('Обработано изображений: 2, ошибок: 1', out.getvalue())
+        self.assertIn(f'Запись {broken.pk}', err.getvalue())
+        first = {}
+        for post in posts:
+            post.refresh_from_db()
+            first[post.pk] = (post.image_variants, self.variant_files(post))
+            self.assertEqual(len(first[post.pk][1]), 4)
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            call_command(
+                'generate_thumbnails', workers=0, stdout=StringIO(), stderr=err
+            )
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(
+                (post.image_variants, self.variant_files(post)),
+                first[post.pk],
+            )
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, Timeline, User, UserStats
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(TimelineTests.reader)
+
+    def feed(self, **params):
+        resp = self.client.get(reverse('posts:follow_index'), params)
+        return resp.context['page']
+
+    def test_fan_out_on_new_post(self):
+        """Новая запись попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='текст', author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed().object_list, [post])
+
+    def test_backfill_and_trim(self):
+        """Подписка дозаполняет ленту, отписка очищает её."""
+        posts = [
+            Post.objects.create(text=str(i), author=self.author)
+            for i in range(3)
+        ]
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(len(self.feed().object_list), len(posts))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed().object_list, [])
+
+    def test_post_delete_cleans_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='текст', author=self.author)
+        post.delete()
+        self.assertFalse(Timeline.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_merged_on_read(self):
+        """Записи популярного автора не раскладываются, а сливаются."""
+        Follow.objects.create(user=self.reader, author=self.star)
+        for i in range(12):
+            Post.objects.create(text=str(i), author=self.star)
+        self.assertFalse(Timeline.objects.exists())
+        first = self.feed()
+        self.assertEqual(len(first.object_list), 10)
+        second = self.feed(after=first.next_cursor)
+        self.assertEqual(len(second.object_list), 2)
+        self.assertIsNone(second.next_cursor)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_posts_from_heavy_period_stay_in_feed(self):
+        """Записи, вышедшие у популярного автора, не теряются после отписок."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.star)
+        follow = Follow.objects.create(user=other, author=self.star)
+        heavy = [
+            Post.objects.create(text=str(i), author=self.star)
+            for i in range(3)
+        ]
+        self.assertFalse(Timeline.objects.exists())
+        follow.delete()
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertIsNotNone(
+            UserStats.objects.get(user=self.star).fanout_since
+        )
+        light = Post.objects.create(text='после', author=self.star)
+        self.assertEqual(
+            list(Timeline.objects.values_list('post', flat=True)), [light.pk]
+        )
+        self.assertEqual(
+            self.feed().object_list, [light] + heavy[::-1]
+        )
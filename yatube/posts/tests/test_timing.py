@@ -0,0 +1,97 @@
+import json
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timing
+from posts.models import Post, User
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xff\xff\xff\x21\xf9\x04\x00\x00\x00\x00\x00\x2c\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0c\x0a\x00\x3b'
+)
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, SERVER_TIMING_SAMPLE_RATE=1, QUERY_BUDGETS={}
+)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(
+            text='текст',
+            author=self.author,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.url = reverse('posts:profile', args=[self.author.username])
+
+    def metrics(self, response):
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_header_and_log(self):
+        """Этапы запроса попадают в Server-Timing и в строку лога."""
+        with self.assertLogs('posts.timing', 'INFO') as logs:
+            cold = Client().get(self.url)
+            warm = Client().get(self.url)
+        metrics = self.metrics(cold)
+        self.assertEqual(
+            set(metrics), {'db', 'tpl', 'thumb', 'cache', 'total'}
+        )
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreater(float(metrics['thumb']['dur']), 0)
+        stages = ('db', 'tpl', 'thumb')
+        self.assertLessEqual(
+            sum(float(metrics[name]['dur']) for name in stages),
+            float(metrics['total']['dur']),
+        )
+        first, second = (
+            json.loads(line.split(':', 2)[2]) for line in logs.output
+        )
+        self.assertEqual(first['view'], 'posts:profile')
+        self.assertGreater(first['db_queries'], 0)
+        self.assertGreater(first['cache_misses'], 0)
+        self.assertGreater(second['cache_hits'], 0)
+        self.assertLess(second['db_queries'], first['db_queries'])
+        self.assertIn('Server-Timing', warm)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        """Вне выборки запрос не замеряется."""
+        self.assertNotIn('Server-Timing', Client().get(self.url))
+
+    def test_stages_exclude_nested_time(self):
+        """Вложенные запросы и этапы не входят во время внешнего этапа."""
+        with timing.recording() as timings:
+            started = time.perf_counter()
+            with timing.measure('tpl'):
+                with timing.measure('thumb'):
+                    time.sleep(0.05)
+                    list(Post.objects.all())
+                time.sleep(0.02)
+            total = time.perf_counter() - started
+        seconds = timings.seconds
+        self.assertEqual(timings.counts['db'], 1)
+        self.assertGreaterEqual(seconds['thumb'], 0.05)
+        self.assertGreaterEqual(seconds['tpl'], 0.02)
+        self.assertLess(seconds['tpl'], 0.05)
+        self.assertAlmostEqual(
+            seconds['tpl'] + seconds['thumb'] + seconds['db'], total, places=3
+        )
@@ -1,3 +1,5 @@
+import gzip
+import json
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -6,9 +8,14 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.models import KVStore
 
+from posts import thumbnails
 from posts.models import Comment, Follow, Group, Post, User
 
 
@@ -173,6 +180,38 @@ class ViewsTests(TestCase):
                     'Ошибка в тесте test_paginator, вторая страница',
                 )
 
+    def test_cursor_paginator(self):
+        """Переход по курсорам ?after= и ?before= без COUNT-запросов."""
+        urls = [
+            reverse('posts:index'),
+            reverse('group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.auth_client.get(url, {'page': 2})
+                self.assertFalse(
+                    [q for q in queries if 'COUNT(' in q['sql'].upper()]
+                )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.auth_client.get(url).context['page']
+                self.assertIsNone(first.previous_cursor)
+                second = self.auth_client.get(
+                    url, {'after': first.next_cursor}
+                ).context['page']
+                self.assertEqual(len(second.object_list), 5)
+                self.assertIsNone(second.next_cursor)
+                self.assertFalse(
+                    set(first.object_list) & set(second.object_list)
+                )
+                back = self.auth_client.get(
+                    url, {'before': second.previous_cursor}
+                ).context['page']
+                self.assertEqual(back.object_list, first.object_list)
+                self.assertIsNone(back.previous_cursor)
+
     def test_post_with_group(self):
         """Проверка на запись нового поста с указанием группы."""
         for i in range(2):
@@ -201,13 +240,181 @@ class ViewsTests(TestCase):
         """Проверка кэша."""
         resp = self.quest_client.get(reverse('posts:index'))
         content = resp.content
-        Post.objects.all().delete()
+        # update() не шлёт сигналов, поэтому версия ленты не меняется.
+        Post.objects.update(text='изменённый текст')
         resp = self.quest_client.get(reverse('posts:index'))
         self.assertEqual(content, resp.content)
         cache.clear()
         resp = self.quest_client.get(reverse('posts:index'))
         self.assertNotEqual(content, resp.content)
 
+    def test_cache_invalidation(self):
+        """Изменение записей и комментариев сразу сбрасывает кэш лент."""
+        urls = [
+            reverse('posts:index'),
+            reverse('group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        changes = [
+            lambda: Post.objects.create(
+                text='Новая запись', author=self.user, group=self.group
+            ),
+            lambda: Comment.objects.create(
+                post=Post.objects.first(), author=self.user_2, text='текст'
+            ),
+            lambda: Post.objects.first().delete(),
+        ]
+        for change in changes:
+            before = [self.quest_client.get(url).content for url in urls]
+            change()
+            for url, content in zip(urls, before):
+                with self.subTest(url=url):
+                    resp = self.quest_client.get(url)
+                    self.assertNotEqual(content, resp.content)
+
+    def test_owner_controls_on_shared_cache(self):
+        """Общий кэш ленты показывает кнопки правки только автору."""
+        edit_url = reverse(
+            'posts:post_edit', args=[self.user.username, self.post.id]
+        )
+        for client, visible in (
+            (self.quest_client, False),
+            (self.auth_client, True),
+            (self.auth_client_2, False),
+        ):
+            with self.subTest(visible=visible):
+                resp = client.get(reverse('posts:index'))
+                self.assertEqual(edit_url in resp.content.decode(), visible)
+                self.assertNotIn('owner-controls', resp.content.decode())
+
+    def test_image_variants(self):
+        """Адаптивные варианты изображения и srcset в карточке."""
+        thumbnails.generate(self.post.id)
+        post = Post.objects.get(id=self.post.id)
+        types = {v['type'] for v in json.loads(post.image_variants)}
+        self.assertEqual(types, {'image/webp', 'image/png'})
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        resp = self.quest_client.get(
+            reverse('posts:post', args=[self.user.username, self.post.id])
+        )
+        content = resp.content.decode()
+        self.assertIn('type="image/webp" srcset="', content)
+        self.assertIn('loading="lazy"', content)
+
+    def test_card_without_variants(self):
+        """Без вариантов карточка берёт готовую миниатюру или оригинал."""
+        url = reverse('posts:post', args=[self.user.username, self.post.id])
+        self.assertContains(
+            self.quest_client.get(url), f'src="{self.post.image.url}"'
+        )
+        self.assertFalse(KVStore.objects.exists())
+        geometry, options = thumbnails.CARD_GEOMETRY
+        thumbnail = get_thumbnail(self.post.image, geometry, **options)
+        cache.clear()
+        self.assertContains(
+            self.quest_client.get(url), f'src="{thumbnail.url}"'
+        )
+
+    def test_profile_export(self):
+        """Выгрузка записей и комментариев автора потоком NDJSON."""
+        Comment.objects.create(post=self.post, author=self.user, text='мой')
+        url = reverse('posts:profile_export', args=[self.user.username])
+        resp = self.auth_client.get(url)
+        self.assertTrue(resp.streaming)
+        rows = [
+            json.loads(line)
+            for line in b''.join(resp.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [row['type'] for row in rows], ['post'] * 15 + ['comment']
+        )
+        self.assertEqual(rows[0]['group'], self.group.slug)
+        resp = self.auth_client.get(url, {'format': 'gzip'})
+        content = gzip.decompress(b''.join(resp.streaming_content))
+        self.assertEqual(len(content.splitlines()), len(rows))
+        resp = self.auth_client_2.get(url)
+        self.assertRedirects(
+            resp, reverse('posts:profile', args=[self.user.username])
+        )
+
+    def test_syndication_feeds(self):
+        """RSS/Atom-ленты кэшируются и отдают 304 по валидаторам."""
+        # Запросом к базе ищется только сообщество или автор ленты.
+        urls = {
+            reverse('posts:index_feed', args=['rss']): 0,
+            reverse('posts:group_feed', args=[self.group.slug, 'atom']): 1,
+            reverse('posts:author_feed', args=[self.user.username, 'rss']): 1,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                resp = self.quest_client.get(url)
+                self.assertEqual(resp.status_code, HTTPStatus.OK)
+                self.assertIn(f'/{self.post.id}/', resp.content.decode())
+                self.assertNotIn('Last-Modified', resp)
+                with self.assertNumQueries(queries):
+                    cached = self.quest_client.get(
+                        url, HTTP_IF_NONE_MATCH=resp['ETag']
+                    )
+                self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+                Post.objects.create(
+                    text='новая', author=self.user, group=self.group
+                )
+                fresh = self.quest_client.get(
+                    url, HTTP_IF_NONE_MATCH=resp['ETag']
+                )
+                self.assertEqual(fresh.status_code, HTTPStatus.OK)
+                self.assertNotEqual(fresh['ETag'], resp['ETag'])
+        resp = self.quest_client.get(
+            reverse('posts:index_feed', args=['json'])
+        )
+        self.assertEqual(resp.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_conditional_get(self):
+        """Неизменившиеся страницы отдаются как 304 Not Modified."""
+        post_url = reverse(
+            'posts:post', args=[self.user.username, self.post.id]
+        )
+        profile_url = reverse('posts:profile', args=[self.user.username])
+        for url in (post_url, profile_url, reverse('group', args=['slug'])):
+            with self.subTest(url=url):
+                etag = self.auth_client_2.get(url)['ETag']
+                resp = self.auth_client_2.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(resp.status_code, HTTPStatus.NOT_MODIFIED)
+                resp = self.auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(resp.status_code, HTTPStatus.OK)
+        etag = self.auth_client_2.get(post_url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user_2, text='да')
+        resp = self.auth_client_2.get(post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        etag = self.auth_client_2.get(profile_url)['ETag']
+        Follow.objects.create(user=self.user_2, author=self.user)
+        resp = self.auth_client_2.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        # Новый вход меняет токен CSRF в форме комментария.
+        etag = self.auth_client_2.get(post_url)['ETag']
+        self.auth_client_2.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        resp = self.auth_client_2.get(post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+
+    def test_group_rename_refreshes_feeds(self):
+        """Новое название сообщества сразу видно в карточках лент."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('group', args=[self.group.slug]),
+        )
+        for url in urls:
+            self.quest_client.get(url)
+        self.group.title = 'переименованная'
+        self.group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.quest_client.get(url), '#переименованная'
+                )
+
     def test_auth_user_can_follow(self):
         """Возможность подписки авторизованным пользователем."""
         self.auth_client.post(
@@ -290,3 +497,41 @@ class ViewsTests(TestCase):
         )
         follow = Follow.objects.count()
         self.assertEqual(follow, count - 1)
+
+
+class FeedQueriesTests(TestCase):
+    """Число запросов ленты не зависит от числа записей и комментариев."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='группа', slug='slug')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(
+                text=str(i), author=cls.author, group=cls.group
+            )
+            for j in range(2):
+                Comment.objects.create(
+                    post=post, author=cls.user, text=str(j)
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(FeedQueriesTests.user)
+
+    def test_feed_queries(self):
+        # Ленты с архивом читают обе таблицы: записи сливаются по дате.
+        pages = {
+            reverse('posts:index'): 4,
+            reverse('group', args=[self.group.slug]): 5,
+            reverse('posts:profile', args=[self.author.username]): 6,
+            reverse('posts:follow_index'): 4,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
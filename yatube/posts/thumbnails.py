@@ -0,0 +1,223 @@
+import base64
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageFilter, ImageOps
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import cache_versions, timing
+from .models import Post, PostBase
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра sorl, которую карточка выводила до адаптивных вариантов:
+# у старых записей без вариантов она может быть уже нарезана.
+CARD_GEOMETRY = ('960x339', {'crop': 'center', 'upscale': True})
+
+# Пропорции карточки ленты, в которые обрезаются адаптивные варианты.
+CARD_RATIO = 339 / 960
+VARIANTS_DIR = 'posts/variants'
+
+_executor = None
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+    """Миниатюры sorl, в шаблонах и при загрузке, — этап thumb."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with timing.measure('thumb'):
+            return super().get_thumbnail(file_, geometry_string, **options)
+
+    def thumbnail_key(self, file_, geometry_string, **options):
+        """Ключ миниатюры в KV-хранилище, как его считает get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage).key
+
+
+class PrefetchingKVStore(KVStore):
+    """KV-хранилище sorl в кэше и базе, читающее много ключей разом."""
+
+    def get_many(self, image_keys):
+        """Как get() для всех ключей, промахи кэша — одним запросом."""
+        keys = {add_prefix(key): key for key in image_keys}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key', 'value'
+                )
+            )
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in values.items()
+            if value != EMPTY_VALUE
+        }
+
+
+def prefetch(posts):
+    """
+    Находит готовые миниатюры sorl для карточек записей без адаптивных
+    вариантов одним запросом. Чтение ничего не нарезает: без миниатюры
+    карточка выводит оригинал, а варианты готовят queue() после загрузки
+    и generate_thumbnails для старых записей.
+    """
+    posts = [
+        post
+        for post in posts
+        if isinstance(post, PostBase)
+        and post.image
+        and not post.image_variants
+    ]
+    if not posts:
+        return
+    geometry, options = CARD_GEOMETRY
+    with timing.measure('thumb'):
+        keys = {
+            post.pk: default.backend.thumbnail_key(
+                post.image, geometry, **options
+            )
+            for post in posts
+        }
+        found = default.kvstore.get_many(keys.values())
+    for post in posts:
+        post.card_thumbnail = found.get(keys[post.pk])
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=80)
+    return buffer.getvalue()
+
+
+def build_variants(post):
+    """
+    Нарезает изображение записи по ширинам IMAGE_VARIANT_WIDTHS в WebP и
+    исходном формате и возвращает описание вариантов и размытую заглушку.
+    """
+    storage = post.image.storage
+    with storage.open(post.image.name) as source:
+        image = Image.open(source)
+        original_format = 'JPEG' if image.format == 'JPEG' else 'PNG'
+        image = ImageOps.exif_transpose(image.convert('RGBA'))
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    formats = (('WEBP', 'webp'), (original_format, original_format.lower()))
+    variants = []
+    for width in sorted(settings.IMAGE_VARIANT_WIDTHS):
+        if variants and width > image.width:
+            break
+        size = (width, round(width * CARD_RATIO))
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        for image_format, extension in formats:
+            name = f'{VARIANTS_DIR}/{post.pk}/{stem}-{width}.{extension}'
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(
+                name, ContentFile(_encode(resized, image_format))
+            )
+            variants.append(
+                {'width': width, 'type': f'image/{extension}', 'name': name}
+            )
+    width = settings.IMAGE_PLACEHOLDER_WIDTH
+    tiny = ImageOps.fit(image, (width, max(round(width * CARD_RATIO), 1)))
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    placeholder = base64.b64encode(_encode(tiny, 'JPEG')).decode()
+    return variants, f'data:image/jpeg;base64,{placeholder}'
+
+
+def generate(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    with timing.measure('thumb'):
+        variants, placeholder = build_variants(post)
+    Post.objects.filter(pk=post.pk).update(
+        image_variants=json.dumps(variants),
+        image_placeholder=placeholder,
+    )
+    # update() не шлёт сигналов, а разметка карточки поменялась.
+    cache_versions.bump_post(post)
+
+
+def delete_files(post):
+    """Удаляет оригинал изображения, его миниатюры и варианты."""
+    if not post.image:
+        return
+    storage = post.image.storage
+    for variant in json.loads(post.image_variants or '[]'):
+        storage.delete(variant['name'])
+    delete(post.image)
+
+
+def generate_safely(post_id):
+    """Вариант для пулов: ошибка одного файла не останавливает остальные."""
+    try:
+        generate(post_id)
+    except Exception as error:
+        logger.exception('Не удалось обработать изображение %s', post_id)
+        return post_id, repr(error)
+    return post_id, None
+
+
+def _run_in_background(post_id):
+    try:
+        generate_safely(post_id)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_INGEST_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def queue(post):
+    """
+    Ставит в очередь миниатюры и адаптивные варианты изображения записи
+    после коммита, чтобы первый просмотр ленты не ресайзил оригинал.
+    """
+    if not post.image:
+        return
+    post_id = post.pk
+
+    def submit():
+        if settings.THUMBNAIL_INGEST_WORKERS:
+            _get_executor().submit(_run_in_background, post_id)
+        else:
+            generate_safely(post_id)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Follow, Post, Timeline, UserStats
+from .paginators import CursorPaginator
+
+
+def is_heavy(author_id):
+    """Автор слишком популярен, чтобы раскладывать его записи по лентам."""
+    return UserStats.objects.filter(
+        user_id=author_id, followers__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def heavy_authors(author_ids):
+    return set(
+        UserStats.objects.filter(
+            user_id__in=author_ids,
+            followers__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def _insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            break
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    if is_heavy(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert(
+        Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку записей ``(pk, author_id, pub_date)`` разом."""
+    posts = list(posts)
+    authors = {author_id for _, author_id, _ in posts}
+    authors -= heavy_authors(authors)
+    followers = defaultdict(list)
+    follows = Follow.objects.filter(author_id__in=authors).values_list(
+        'author_id', 'user_id'
+    )
+    for author_id, user_id in follows.iterator():
+        followers[author_id].append(user_id)
+    _insert(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, author_id, pub_date in posts
+        for user_id in followers[author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    if is_heavy(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    _insert(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+    )
+
+
+def settle(author_id, removed):
+    """
+    После отписок ``removed`` читателей автор мог перестать быть
+    популярным: его записи снова раскладываются по лентам, а более ранние
+    сливаются при чтении от момента ``fanout_since``.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    UserStats.objects.filter(
+        user_id=author_id,
+        followers__lte=limit,
+        followers__gt=limit - removed,
+    ).update(fanout_since=timezone.now())
+
+
+def trim(user_id, author_id):
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок: диапазонный проход по индексу ``Timeline`` плюс
+    слияние при чтении с записями популярных авторов, которые не
+    раскладываются по лентам, и с записями бывших популярных авторов,
+    опубликованными до ``fanout_since``.
+    """
+
+    def __init__(self, user, per_page):
+        # Строки удалённых записей живут до фоновой очистки.
+        entries = Timeline.objects.filter(
+            user=user, post__deleted_at__isnull=True
+        ).order_by('-pub_date', '-post_id')
+        super().__init__(entries, per_page)
+        followed = Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        )
+        self.merged = Q()
+        authors = UserStats.objects.filter(user_id__in=followed).filter(
+            Q(followers__gt=settings.TIMELINE_FANOUT_LIMIT)
+            | Q(fanout_since__isnull=False)
+        )
+        heavy = []
+        for author_id, followers, since in authors.values_list(
+            'user_id', 'followers', 'fanout_since'
+        ):
+            if followers > settings.TIMELINE_FANOUT_LIMIT:
+                heavy.append(author_id)
+            else:
+                self.merged |= Q(author_id=author_id, pub_date__lt=since)
+        if heavy:
+            self.merged |= Q(author_id__in=heavy)
+
+    def fetch(self, cursor=None, descending=True, offset=0):
+        limit = offset + self.per_page + 1
+        entries = self.keyset(
+            self.object_list,
+            cursor,
+            descending,
+            keys=('pub_date', 'post_id'),
+        ).select_related('post__author', 'post__group')
+        posts = [entry.post for entry in entries[:limit]]
+        if self.merged:
+            merged = self.keyset(
+                Post.objects.filter(self.merged),
+                cursor,
+                descending,
+            ).select_related('author', 'group')
+            unique = {post.pk: post for post in posts + list(merged[:limit])}
+            posts = sorted(
+                unique.values(),
+                key=lambda post: (post.pub_date, post.pk),
+                reverse=descending,
+            )
+        return posts[offset:limit]
@@ -0,0 +1,120 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+state = threading.local()
+
+
+class RequestTimings:
+    """
+    Время по этапам и счётчики событий одного запроса.
+    Этап получает только собственное время: вложенные в него запросы
+    и другие этапы вычитаются, поэтому сумма этапов не больше total.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = Counter()
+        # Время вложенных этапов для каждого открытого measure().
+        self.nested = []
+
+    def add(self, name, elapsed, nested=0.0):
+        self.seconds[name] += elapsed - nested
+        if self.nested:
+            self.nested[-1] += elapsed
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+            self.counts['db'] += 1
+
+
+def current():
+    return getattr(state, 'timings', None)
+
+
+@contextmanager
+def recording():
+    """Включает замеры для текущего потока на время запроса."""
+    state.timings = timings = RequestTimings()
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timings)
+                )
+            yield timings
+    finally:
+        state.timings = None
+
+
+@contextmanager
+def measure(name):
+    """
+    Прибавляет собственное время блока к этапу ``name``, если запрос
+    замеряется.
+    """
+    timings = current()
+    if timings is None:
+        yield
+        return
+    timings.nested.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.add(name, elapsed, timings.nested.pop())
+
+
+def count(name, amount=1):
+    timings = current()
+    if timings is not None:
+        timings.counts[name] += amount
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def header(timings, total):
+    """Значение Server-Timing: этапы видны во вкладке Network браузера."""
+    seconds, counts = timings.seconds, timings.counts
+    return ', '.join(
+        (
+            f'db;dur={_ms(seconds["db"])};desc="{counts["db"]} queries"',
+            f'tpl;dur={_ms(seconds["tpl"])}',
+            f'thumb;dur={_ms(seconds["thumb"])}',
+            f'cache;desc="hit {counts["cache_hit"]} '
+            f'miss {counts["cache_miss"]}"',
+            f'total;dur={_ms(total)}',
+        )
+    )
+
+
+def log(request, response, timings, total):
+    match = request.resolver_match
+    seconds, counts = timings.seconds, timings.counts
+    record = {
+        'view': match.view_name if match else None,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': _ms(total),
+        'db_ms': _ms(seconds['db']),
+        'db_queries': counts['db'],
+        'tpl_ms': _ms(seconds['tpl']),
+        'thumb_ms': _ms(seconds['thumb']),
+        'cache_hits': counts['cache_hit'],
+        'cache_misses': counts['cache_miss'],
+    }
+    logger.info(json.dumps(record, ensure_ascii=False))
@@ -9,6 +9,18 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('feeds/<feed_format>/', views.index_feed, name='index_feed'),
+    path(
+        'feeds/group/<slug>/<feed_format>/',
+        views.group_feed,
+        name='group_feed',
+    ),
+    path(
+        'feeds/author/<str:username>/<feed_format>/',
+        views.author_feed,
+        name='author_feed',
+    ),
     path('<str:username>/', views.profile, name='profile'),
     path(
         '<str:username>/follow/', views.profile_follow, name='profile_follow'
@@ -18,6 +30,9 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow',
     ),
+    path(
+        '<str:username>/export/', views.profile_export, name='profile_export'
+    ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/', views.post_edit, name='post_edit'
@@ -29,5 +44,3 @@ urlpatterns = [
         name='add_comment',
     ),
 ]
-
-af = collections.Counter()
@@ -1,51 +1,245 @@
+import hashlib
 from http import HTTPStatus
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
+from . import cache_versions, exports, feeds, metrics, purge, thumbnails
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import ArchivedPost, Follow, Group, Post, User
+from .overlays import personalize
+from .paginators import TieredPaginator
+from .routers import reads_from_replica, replica_reads
+from .search import SearchPaginator
+from .timeline import TimelinePaginator
 
+POSTS_PER_PAGE = 10
 
+
+def get_page(request, paginator):
+    page = paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    # Миниатюры карточек без вариантов — одним запросом на страницу;
+    # результаты поиска держат запись в hit.object.
+    thumbnails.prefetch(getattr(row, 'object', row) for row in page)
+    return page
+
+
+def feed_cache(*scopes):
+    timeout = settings.FEED_CACHE_TIMEOUT
+    if (
+        settings.DATABASE_REPLICAS
+        and reads_from_replica()
+        and not cache_versions.settled(*scopes)
+    ):
+        # Версия уже новая, а реплика могла ещё не получить изменение:
+        # такую страницу нельзя запомнить под новой версией.
+        timeout = 0
+    return {
+        'feed_version': cache_versions.version(*scopes),
+        'feed_cache_timeout': timeout,
+    }
+
+
+def page_etag(request, cache_context, *state):
+    """
+    Валидатор страницы: версия её лент, зритель и то, что выводится
+    мимо кэша фрагментов. Считается до пагинации и шаблонов. Страница,
+    которая не кэшируется (см. feed_cache), ETag не получает.
+    """
+    if not cache_context['feed_cache_timeout']:
+        return None
+    raw = repr((cache_context['feed_version'], request.user.pk, state))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def author_state(author):
+    stats = getattr(author, 'stats', None)
+    if stats is None:
+        return author.get_full_name(), None
+    return (
+        author.get_full_name(),
+        stats.followers,
+        stats.following,
+        stats.posts,
+    )
+
+
+@personalize
+@replica_reads
 def index(request):
+    cache_context = feed_cache('index')
     posts_list = Post.objects.all().select_related('author', 'group')
-    paginator = Paginator(posts_list, 10)
-    page_num = request.GET.get('page')
-    page = paginator.get_page(page_num)
-    return render(request, 'index.html', {'page': page})
+    archive = ArchivedPost.objects.select_related('author', 'group')
+    page = get_page(
+        request, TieredPaginator(posts_list, archive, POSTS_PER_PAGE)
+    )
+    return render(request, 'index.html', {'page': page, **cache_context})
 
 
+@personalize
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_num = request.GET.get('page')
-    page = paginator.get_page(page_num)
-    return render(request, 'group.html', {'group': group, 'page': page})
+    cache_context = feed_cache(f'group:{group.pk}')
+    etag = page_etag(request, cache_context, group.title, group.description)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    posts = group.posts.select_related('author', 'group')
+    archive = group.archived_posts.select_related('author', 'group')
+    page = get_page(request, TieredPaginator(posts, archive, POSTS_PER_PAGE))
+    context = {'group': group, 'page': page, **cache_context}
+    response = render(request, 'group.html', context)
+    if etag:
+        response['ETag'] = etag
+    return response
 
 
+@personalize
+@replica_reads
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, 10)
-    page_num = request.GET.get('page')
-    page = paginator.get_page(page_num)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+        removal__isnull=True,
+    )
+    cache_context = feed_cache(f'author:{author.pk}')
     is_following = (
         request.user.is_authenticated
         and Follow.objects.filter(user=request.user, author=author).exists()
     )
-    context = {'author': author, 'page': page, 'is_following': is_following}
-    return render(request, 'posts/profile.html', context)
+    etag = page_etag(
+        request, cache_context, author_state(author), is_following
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    posts = author.posts.select_related('author', 'group')
+    archive = author.archived_posts.select_related('author', 'group')
+    page = get_page(request, TieredPaginator(posts, archive, POSTS_PER_PAGE))
+    context = {
+        'author': author,
+        'page': page,
+        'is_following': is_following,
+        **cache_context,
+    }
+    response = render(request, 'posts/profile.html', context)
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    if username != request.user.username:
+        return redirect('posts:profile', username)
+    stream = exports.ndjson(exports.records(request.user))
+    filename = f'{username}.ndjson'
+    if request.GET.get('format') == 'gzip':
+        response = StreamingHttpResponse(
+            exports.gzipped(stream), content_type='application/gzip'
+        )
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(
+            stream, content_type='application/x-ndjson; charset=utf-8'
+        )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 
+def get_post_or_404(username, post_id):
+    """Запись из горячей таблицы или, если её там нет, из архива."""
+    for model in (Post, ArchivedPost):
+        post = (
+            model.objects.select_related('author__stats', 'group')
+            .filter(id=post_id, author__username=username)
+            .first()
+        )
+        if post is not None:
+            return post
+    raise Http404
 
+
+@personalize
+@replica_reads
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = post.comments.all()
+    post = get_post_or_404(username, post_id)
+    # Правки записи и комментарии к ней увеличивают версию ленты автора.
+    cache_context = feed_cache(f'author:{post.author_id}')
+    # В форме комментария токен CSRF: после нового входа копия страницы
+    # из кэша браузера отправила бы форму с устаревшим токеном.
+    csrf = None
+    if request.user.is_authenticated and not post.is_archived:
+        get_token(request)
+        csrf = request.META['CSRF_COOKIE']
+    etag = page_etag(request, cache_context, author_state(post.author), csrf)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    thumbnails.prefetch([post])
+    comments = post.comments.select_related('author').order_by('created')
     form = CommentForm()
     context = {'post': post, 'comments': comments, 'form': form}
 
-    return render(request, 'posts/post.html', context)
+    response = render(request, 'posts/post.html', context)
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+@personalize
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = get_page(request, SearchPaginator(query, POSTS_PER_PAGE))
+    return render(request, 'posts/search.html', {'query': query, 'page': page})
+
+
+def index_feed(request, feed_format):
+    return feeds.serve(request, feeds.IndexFeed, feed_format, 'index')
+
+
+def group_feed(request, slug, feed_format):
+    group_id = get_object_or_404(
+        Group.objects.filter(slug=slug).values_list('pk', flat=True)
+    )
+    return feeds.serve(
+        request,
+        feeds.GroupFeed,
+        feed_format,
+        f'group:{group_id}',
+        slug=slug,
+    )
+
+
+def author_feed(request, username, feed_format):
+    author_id = get_object_or_404(
+        User.objects.filter(
+            username=username, removal__isnull=True
+        ).values_list('pk', flat=True)
+    )
+    return feeds.serve(
+        request,
+        feeds.AuthorFeed,
+        feed_format,
+        f'author:{author_id}',
+        username=username,
+    )
+
+
+def prometheus_metrics(request):
+    if not metrics.allowed(request):
+        raise Http404
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 @login_required
@@ -55,6 +249,7 @@ def new_post(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.queue(post)
         return redirect('posts:index')
     return render(request, 'posts/new_edit_post.html', {'form': form})
 
@@ -62,11 +257,13 @@ def new_post(request):
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post', username, post_id)
     form = PostForm(request.POST or None, request.FILES or None, instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.queue(post)
         return redirect('posts:post', username, post_id)
     return render(
         request, 'posts/new_edit_post.html', {'form': form, 'post': post}
@@ -101,12 +298,15 @@ def add_comment(request, username, post_id):
 
 
 @login_required
+@personalize
+@replica_reads
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_num = request.GET.get('page')
-    page = paginator.get_page(page_num)
-    return render(request, 'posts/follow.html', {'page': page})
+    cache_context = feed_cache('index', f'follow:{request.user.pk}')
+    page = get_page(
+        request, TimelinePaginator(request.user, POSTS_PER_PAGE)
+    )
+    context = {'page': page, **cache_context}
+    return render(request, 'posts/follow.html', context)
 
 
 @login_required
@@ -129,5 +329,7 @@ def profile_unfollow(request, username):
 def post_delete(request, username, post_id):
     if username != request.user.username:
         return redirect('/')
-    get_object_or_404(Post, id=post_id).delete()
+    purge.delete_post(
+        get_object_or_404(Post, id=post_id, author=request.user)
+    )
     return redirect('posts:profile', username)
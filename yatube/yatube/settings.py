@@ -22,6 +22,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "posts.middleware.ServerTimingMiddleware",
+    "posts.middleware.MetricsMiddleware",
+    "posts.middleware.QueryBudgetMiddleware",
+    "posts.middleware.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -29,6 +33,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "posts.middleware.ReplicaPinMiddleware",
+    "posts.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
@@ -37,7 +43,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "posts.backends.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -57,9 +63,47 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Соединение переживает запрос: без этого каждый запрос заново
+        # открывает файл базы и применяет SQLITE_PRAGMAS.
+        "CONN_MAX_AGE": 60,
     }
 }
 
+# Реплики для чтения лент: пути к копиям базы через запятую, например
+# YATUBE_SQLITE_REPLICAS=replica.sqlite3. Запись идёт только в default.
+for number, path in enumerate(
+    filter(None, os.environ.get("YATUBE_SQLITE_REPLICAS", "").split(","))
+):
+    DATABASES[f"replica{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+        "CONN_MAX_AGE": 60,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["posts.routers.ReplicaRouter"]
+# На реплики идут только модели этих приложений: сессии и служебные
+# таблицы всегда читаются из основной базы.
+REPLICA_APPS = {"posts", "auth"}
+# Сколько секунд после своей записи клиент читает из основной базы.
+REPLICA_PIN_SECONDS = 10
+# Наибольшее отставание реплик, с. Столько после сброса версии ленты её
+# страницы с реплики не кэшируются и отдаются без ETag.
+REPLICA_MAX_LAG = 10
+
+# Применяются к каждому новому соединению с SQLite (posts.sqlite).
+# WAL позволяет читать во время записи, NORMAL в режиме WAL не теряет
+# целостность при сбое процесса, busy_timeout ждёт блокировку вместо
+# мгновенного «database is locked». cache_size < 0 — в килобайтах.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "memory",
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"
@@ -97,6 +141,149 @@ LOGIN_REDIRECT_URL = "posts:index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# LocMemCache у каждого процесса свой: сброс версии ленты в одном
+# воркере не виден другим. При нескольких воркерах задайте файл общего
+# кэша YATUBE_CACHE_PATH, например /var/cache/yatube/cache.sqlite3.
+# Без него (тесты, runserver) кэш остаётся в памяти процесса.
 CACHES = {
-    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    "default": {"BACKEND": "posts.backends.LocMemCache"}
+}
+if os.environ.get("YATUBE_CACHE_PATH"):
+    CACHES["default"] = {
+        "BACKEND": "posts.backends.SQLiteCache",
+        "LOCATION": os.environ["YATUBE_CACHE_PATH"],
+        "OPTIONS": {
+            "MAX_ENTRIES": 100000,
+            "MAX_BYTES": 256 * 1024 * 1024,
+        },
+    }
+
+# Лента подписок: записи авторов раскладываются по лентам подписчиков
+# при публикации. У авторов с числом подписчиков больше лимита лента
+# собирается при чтении, чтобы одна запись не порождала миллионы строк.
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BACKFILL_SIZE = 1000
+TIMELINE_BATCH_SIZE = 1000
+
+# Фрагменты лент живут долго: ключ содержит версию ленты, которую
+# сигналы Post/Comment/Follow увеличивают при любом изменении.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Миниатюры создаются при загрузке: 0 — сразу после коммита в том же
+# запросе, N > 0 — в фоновом пуле из N потоков. Фоновым потокам нужна
+# база, допускающая параллельную запись (не SQLite в памяти).
+THUMBNAIL_INGEST_WORKERS = 0
+
+# Ширины адаптивных вариантов изображений для srcset и ширина размытой
+# заглушки, которая показывается до загрузки картинки.
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_PLACEHOLDER_WIDTH = 16
+
+# Выгрузка данных автора читает строки из курсора порциями такого
+# размера и отдаёт их потоком, не собирая ответ в памяти.
+EXPORT_CHUNK_SIZE = 2000
+
+# Число записей в RSS/Atom-лентах.
+SYNDICATION_ITEMS = 20
+
+# Удаление только скрывает записи и аккаунты; строки и файлы удаляет
+# purge_deleted пачками по PURGE_BATCH_SIZE с паузой между ними, чтобы
+# не держать долгую блокировку записи.
+PURGE_BATCH_SIZE = 500
+PURGE_PAUSE = 0.05
+
+# Записи старше ARCHIVE_AFTER_DAYS дней команда archive_posts переносит
+# в архивную таблицу: ленты, профиль и поиск находят их там же.
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+# Бюджеты запросов к базе по имени url: QueryBudgetMiddleware пишет
+# предупреждение в лог posts.budgets с повторяющимися запросами, если
+# view их превысило, а тест test_budgets не даёт превысить их в коде.
+# Бюджет покрывает худший обычный путь на холодном кэше: ленты — с
+# картинками без вариантов и популярными авторами, новая запись и
+# правка — с группой, картинкой и раскладкой по лентам подписчиков.
+QUERY_BUDGETS = {
+    "posts:index": 5,
+    "posts:new_post": 11,
+    "posts:follow_index": 6,
+    "posts:search": 6,
+    "posts:index_feed": 2,
+    "posts:group_feed": 3,
+    "posts:author_feed": 3,
+    "group": 6,
+    "posts:profile": 7,
+    "posts:profile_follow": 10,
+    "posts:profile_unfollow": 8,
+    "posts:profile_export": 2,
+    "posts:post": 5,
+    "posts:post_edit": 9,
+    "posts:post_delete": 5,
+    "posts:add_comment": 6,
+}
+
+# Доля запросов, для которых ServerTimingMiddleware замеряет SQL,
+# шаблоны, кэш и миниатюры: заголовок Server-Timing и строка JSON в лог
+# posts.timing. Например, YATUBE_SERVER_TIMING_SAMPLE_RATE=0.01.
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.environ.get("YATUBE_SERVER_TIMING_SAMPLE_RATE", "0")
+)
+THUMBNAIL_BACKEND = "posts.thumbnails.TimedThumbnailBackend"
+THUMBNAIL_KVSTORE = "posts.thumbnails.PrefetchingKVStore"
+
+# Метрики в формате Prometheus на /metrics/. При нескольких процессах
+# задайте общий каталог YATUBE_METRICS_DIR: каждый процесс раз в
+# METRICS_FLUSH_SECONDS сохраняет туда свои значения в worker-*.json, а
+# страница метрик суммирует все файлы, а файлы завершившихся процессов
+# переносит в archive.json. Без каталога видны значения только
+# отвечающего процесса. Доступ — сотрудникам и по заголовку
+# "Authorization: Bearer $YATUBE_METRICS_TOKEN".
+METRICS_DIR = os.environ.get("YATUBE_METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = os.environ.get("YATUBE_METRICS_TOKEN", "")
+
+# Профилировщик запросов: сотрудник добавляет ?profile=1, скрипт —
+# заголовок X-Profile из manage.py profile_token (действует
+# PROFILE_TOKEN_MAX_AGE секунд). PROFILE_SAMPLE_EVERY задаёт выборку
+# 1 из N запросов по имени url, например {"posts:follow_index": 1000}.
+# Стеки снимаются раз в PROFILE_INTERVAL секунд и сохраняются в
+# PROFILE_DIR в формате collapsed stacks для flamegraph.pl/speedscope.
+PROFILE_DIR = os.environ.get(
+    "YATUBE_PROFILE_DIR", os.path.join(BASE_DIR, "profiles")
+)
+PROFILE_INTERVAL = 0.005
+PROFILE_SAMPLE_EVERY = {}
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Запросы к базе дольше SLOW_QUERY_MS миллисекунд пишутся строками JSON
+# с именем url, текстом без значений, хэшем параметров и EXPLAIN QUERY
+# PLAN в SLOW_QUERY_LOG; manage.py slowqueries сводит их в отчёт.
+SLOW_QUERY_MS = float(os.environ.get("YATUBE_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get(
+    "YATUBE_SLOW_QUERY_LOG", os.path.join(BASE_DIR, "slowqueries.log")
+)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+        "slowqueries": {
+            "class": "logging.FileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "posts.timing": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "posts.slowqueries": {
+            "handlers": ["slowqueries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
 }
@@ -12,6 +12,7 @@ handler500 = 'posts.views.server_error'  # noqa
 urlpatterns = [
     path('404/', posts.page_not_found),
     path('500/', posts.server_error),
+    path('metrics/', posts.prometheus_metrics, name='metrics'),
     path('', include('posts.urls', namespace='posts')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),